@@ -0,0 +1,52 @@
+from django.db import connections, transaction
+from .availability import availability
+from .catalog_cache import invalidate
+from .models import Loan, LoanArchive
+
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVED_FIELDS = ('id', 'car_id', 'user_id', 'returned', 'rent_date', 'return_date', 'total_price')
+
+
+def archive_loans(cutoff, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False, progress=None, using='default'):
+    """Moves returned loans that ended before `cutoff` from `loans` to
+    `loans_archive`, keeping their ids. Each batch is one INSERT ... SELECT
+    plus one DELETE in its own transaction, and batches walk the primary key,
+    so the table is read once however many batches it takes. Rental counters
+    and daily stats already count these loans and are left alone. The raw
+    DELETE sends no signals, so each batch drops its loans from the
+    availability index and the catalog cache itself on commit.
+    Returns the number of loans archived (or that would be, with dry_run)."""
+    closed = Loan.objects.using(using).filter(returned=True, return_date__lt=cutoff).order_by('id')
+    if dry_run:
+        return closed.count()
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(LoanArchive._meta.get_field(name).column) for name in ARCHIVED_FIELDS)
+    loans_table, archive_table = quote(Loan._meta.db_table), quote(LoanArchive._meta.db_table)
+    moved = last_id = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(closed.select_for_update().filter(id__gt=last_id)
+                        .values_list('id', 'car_id', 'rent_date', 'return_date')[:batch_size])
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+            select_sql, params = (Loan.objects.using(using).filter(id__in=ids).values_list(*ARCHIVED_FIELDS)
+                                  .order_by().query.get_compiler(using=using).as_sql())
+            placeholders = ', '.join(['%s'] * len(ids))
+            with connection.cursor() as cursor:
+                cursor.execute(f'INSERT INTO {archive_table} ({columns}) {select_sql}', params)
+                cursor.execute(f'DELETE FROM {loans_table} WHERE {quote("id")} IN ({placeholders})', ids)
+            transaction.on_commit(lambda rows=rows: _forget_archived(rows), using=using)
+        moved += len(ids)
+        last_id = ids[-1]
+        if progress is not None:
+            progress(moved)
+    return moved
+
+
+def _forget_archived(rows):
+    for _, car_id, start, end in rows:
+        availability.remove(car_id, start, end)
+    invalidate(Loan)
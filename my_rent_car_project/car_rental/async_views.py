@@ -0,0 +1,157 @@
+import json
+from decimal import Decimal, InvalidOperation
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import DatabaseError
+from django.http import JsonResponse, HttpResponseForbidden
+from django.shortcuts import redirect, render
+from .availability import availability
+from .catalog_cache import invalidate
+from .db_router import read_from_replica
+from .models import Car, Manufacturer, Loan
+from .views import (RENT_CONFLICT_ERROR, RENT_RETRY_ERROR, SEARCH_DEFAULT_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE, book_car,
+                    build_car_filters, close_loan, flag_is, parse_rent_request, serialize_car)
+
+# Async counterparts of the endpoints in views.py, with the same requests and
+# responses. Under an ASGI server they await the database instead of holding a
+# worker thread per request.
+
+
+def async_superuser_required(view_func):
+    async def _wrapped_view(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect('login')
+        if not user.is_superuser:
+            return HttpResponseForbidden("You do not have permission to access this page.")
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+@login_required
+@read_from_replica('search')
+async def search_car(request):
+    cars = Car.objects.filter(build_car_filters(request.GET)).select_related('manufacturer', 'image').order_by('id')
+
+    after_id = request.GET.get('after_id', '')
+    limit = request.GET.get('limit', '')
+
+    if not after_id and not limit:
+        return JsonResponse([serialize_car(car) async for car in cars], safe=False)
+
+    try:
+        after_id = int(after_id) if after_id else 0
+        limit = int(limit) if limit else SEARCH_DEFAULT_PAGE_SIZE
+    except ValueError:
+        return JsonResponse({"detail": "after_id and limit must be integers."}, status=400)
+
+    if limit < 1:
+        return JsonResponse({"detail": "limit must be a positive integer."}, status=400)
+    limit = min(limit, SEARCH_MAX_PAGE_SIZE)
+
+    page = [car async for car in cars.filter(id__gt=after_id)[:limit + 1]]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = page[-1].id
+
+    return JsonResponse({
+        "results": [serialize_car(car) for car in page],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+async def rent_car(request):
+    # Answers with the rent_car page like views.rent_car, so benchmark_async_views
+    # compares the same work. Rendering may touch request.user and the session,
+    # so it runs in the sync thread.
+    async def page(context=None):
+        return await sync_to_async(render)(request, 'car_rental/rent_car.html', context)
+
+    if request.method != 'POST':
+        return await page()
+    booking, context = parse_rent_request(request)
+    if booking is None:
+        return await page(context)
+    car_id, start_date, end_date = booking
+
+    if await sync_to_async(availability.has_conflict)(car_id, start_date, end_date):
+        return await page({'error': RENT_CONFLICT_ERROR})
+
+    # Django transactions are not available to async code, so the locked
+    # booking transaction runs in the sync thread.
+    user = await request.auser()
+    try:
+        loan, error = await sync_to_async(book_car)(user, car_id, start_date, end_date)
+    except DatabaseError:
+        return await page({'error': RENT_RETRY_ERROR})
+    if error:
+        return await page({'error': error})
+    return await page({'message': 'You booked successfully!', 'total_price': loan.total_price})
+
+
+@login_required
+async def return_car(request):
+    if request.method == 'GET':
+        return await sync_to_async(render)(request, 'car_rental/return_car.html')
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Method not allowed.'}, status=405)
+    try:
+        car_id = int(json.loads(request.body)['car_id'])
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'car_id is required.'}, status=400)
+
+    user = await request.auser()
+    loan = await Loan.objects.filter(flag_is('returned', False), car_id=car_id).order_by('-rent_date').afirst()
+
+    if not loan:
+        return JsonResponse({'status': 'error', 'message': 'This car is not currently rented.'})
+
+    if loan.user_id != user.id:
+        return JsonResponse({'status': 'error', 'message': 'You did not rent this car.'})
+
+    # Both writes share one transaction, which only sync code can open.
+    if not await sync_to_async(close_loan)(loan):
+        return JsonResponse({'status': 'error', 'message': 'Car not found.'})
+    # update() sends no signals, so the car's cached catalog entries are dropped here.
+    await sync_to_async(invalidate)(Car)
+
+    return JsonResponse({'status': 'success', 'message': 'Car returned successfully.'})
+
+
+@async_superuser_required
+async def add_car(request):
+    if request.method != 'POST':
+        return JsonResponse({"detail": "Method not allowed."}, status=405)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"detail": "Invalid JSON"}, status=400)
+
+    manufacturer_name = data.get('manufacturer_name')
+    if not manufacturer_name:
+        return JsonResponse({"detail": "Manufacturer name is required."}, status=400)
+    manufacturer = await Manufacturer.objects.filter(name=manufacturer_name).afirst()
+    if not manufacturer:
+        return JsonResponse({"detail": "Manufacturer not found."}, status=404)
+    price_str = data.get('price_per_day_usd')
+    if not price_str:
+        return JsonResponse({"detail": "Price is required."}, status=400)
+    try:
+        price_decimal = Decimal(str(price_str))
+    except InvalidOperation:
+        return JsonResponse({"detail": "Price must be a number."}, status=400)
+
+    try:
+        await Car.objects.acreate(
+            manufacturer=manufacturer,
+            model=data.get('model'),
+            year=data.get('year'),
+            transmission=data.get('transmission'),
+            price_per_day_usd=price_decimal,
+            available=True
+        )
+    except Exception as e:
+        return JsonResponse({"detail": str(e)}, status=500)
+    return JsonResponse({"message": "Car added successfully."})
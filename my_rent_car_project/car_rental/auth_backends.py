@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+from .passwords import hash_password, verify_password
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def forget_user(user_id):
+    # Dropped right away and again on commit, so a request that re-cached the
+    # old row in between is not served afterwards.
+    key = _user_key(user_id)
+    get_user_cache().delete(key)
+    transaction.on_commit(lambda: get_user_cache().delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose per-request user lookup (AuthenticationMiddleware)
+    is served from a cache for AUTH_USER_CACHE_TIMEOUT seconds. Saving or
+    deleting the user drops the entry; see signals.forget_changed_user.
+    Password checks go through the hashing limiter (passwords.run_hashing);
+    the request thread still waits for them."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so an unknown username takes as long as a wrong password.
+            hash_password(password)
+            return None
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        cache = get_user_cache()
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
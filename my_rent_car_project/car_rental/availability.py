@@ -0,0 +1,149 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date
+from django.conf import settings
+from .models import Loan
+
+
+class IntervalList:
+    """Loan periods of one car sorted by start, with a running max of the ends
+    so an overlap check is a single bisect."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.max_ends = []
+
+    def add(self, start, end):
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.max_ends.insert(index, end)
+        running = self.max_ends[index - 1] if index else None
+        for i in range(index, len(self.ends)):
+            running = self.ends[i] if running is None else max(running, self.ends[i])
+            self.max_ends[i] = running
+
+    def remove(self, start, end):
+        """Drops one period equal to (start, end); returns False if there is none."""
+        index = bisect_left(self.starts, start)
+        while index < len(self.starts) and self.starts[index] == start:
+            if self.ends[index] == end:
+                del self.starts[index], self.ends[index], self.max_ends[index]
+                running = self.max_ends[index - 1] if index else None
+                for i in range(index, len(self.ends)):
+                    running = self.ends[i] if running is None else max(running, self.ends[i])
+                    self.max_ends[i] = running
+                return True
+            index += 1
+        return False
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end):
+        index = bisect_right(self.starts, end)
+        return index > 0 and self.max_ends[index - 1] >= start
+
+
+class AvailabilityEngine:
+    """In-process index of loan periods per car.
+
+    It only holds loans ending on or after the day it was warmed (the horizon);
+    questions about earlier dates return None so callers fall back to the DB.
+    Bookings made by other processes are picked up on the next re-warm, which
+    happens every `ttl` seconds, so a "free" answer must still be confirmed
+    against the DB before booking. Loans deleted or archived in this process
+    leave the index on commit; ones removed by another process keep reporting
+    a conflict until the next re-warm.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self._intervals = None
+        self._horizon = None
+        self._warmed_at = None
+
+    def _get_ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, 'AVAILABILITY_ENGINE_TTL', 300)
+
+    def warm(self):
+        horizon = date.today()
+        intervals = {}
+        loans = Loan.objects.filter(return_date__gte=horizon).values_list('car_id', 'rent_date', 'return_date')
+        for car_id, start, end in loans.iterator(chunk_size=5000):
+            intervals.setdefault(car_id, IntervalList()).add(start, end)
+        with self._lock:
+            self._intervals = intervals
+            self._horizon = horizon
+            self._warmed_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._intervals = None
+            self._horizon = None
+            self._warmed_at = None
+
+    def _is_stale(self):
+        return self._intervals is None or time.monotonic() - self._warmed_at > self._get_ttl()
+
+    def _ensure_warm(self):
+        if not self._is_stale():
+            return
+        # Single flight: one request rebuilds the index. The others wait for
+        # the first build, and keep answering from the old index on a re-warm.
+        if not self._warm_lock.acquire(blocking=self._intervals is None):
+            return
+        try:
+            if self._is_stale():
+                self.warm()
+        finally:
+            self._warm_lock.release()
+
+    def add(self, car_id, start, end):
+        with self._lock:
+            if self._intervals is None or end < self._horizon:
+                return
+            self._intervals.setdefault(car_id, IntervalList()).add(start, end)
+
+    def remove(self, car_id, start, end):
+        with self._lock:
+            if self._intervals is None or car_id not in self._intervals:
+                return
+            intervals = self._intervals[car_id]
+            intervals.remove(start, end)
+            if not intervals:
+                del self._intervals[car_id]
+
+    def remove_car(self, car_id):
+        with self._lock:
+            if self._intervals is not None:
+                self._intervals.pop(car_id, None)
+
+    def has_conflict(self, car_id, start, end):
+        self._ensure_warm()
+        with self._lock:
+            if start < self._horizon:
+                return None
+            intervals = self._intervals.get(car_id)
+            return intervals is not None and intervals.overlaps(start, end)
+
+    def free_car_ids(self, car_ids, start, end):
+        self._ensure_warm()
+        with self._lock:
+            if start < self._horizon:
+                return None
+            free = []
+            for car_id in car_ids:
+                intervals = self._intervals.get(car_id)
+                if intervals is None or not intervals.overlaps(start, end):
+                    free.append(car_id)
+            return free
+
+
+availability = AvailabilityEngine()
@@ -0,0 +1,232 @@
+import asyncio
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from .stats import summarize
+
+# Seeded loan histories must fit between year 1 and today.
+MAX_HISTORY_DAYS = 100 * 365
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """Runs the block against a throwaway test database, like the test runner does."""
+    setup_test_environment()
+    connection = connections['default']
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def run_sequentially(make_request, total, warmup=0, using='default'):
+    """Calls make_request(i) for i in range(total) on this thread and adds
+    SQL query counts per request to the latency summary. make_request returns
+    True on success. The first `warmup` calls are not measured."""
+    connection = connections[using]
+    for i in range(warmup):
+        make_request(i)
+    latencies = []
+    query_counts = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(warmup, warmup + total):
+        with CaptureQueriesContext(connection) as queries:
+            request_started = time.perf_counter()
+            ok = make_request(i)
+            latencies.append(time.perf_counter() - request_started)
+        query_counts.append(len(queries))
+        errors += 0 if ok else 1
+    summary = summarize(latencies, time.perf_counter() - started, errors)
+    summary['queries_mean'] = round(statistics.mean(query_counts), 2) if query_counts else 0.0
+    summary['queries_max'] = max(query_counts, default=0)
+    return summary
+
+
+async def run_concurrently(make_request, total, concurrency):
+    """Awaits make_request(i) for i in range(total), at most `concurrency` at a
+    time, and summarizes latencies, wall time and HTTP error responses."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - started)
+            if getattr(response, 'status_code', 200) >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def seed_small_fleet(cars=100, manufacturers=5):
+    from .models import Car, Manufacturer
+    Manufacturer.objects.bulk_create([
+        Manufacturer(name=f'Bench Maker {i}', country='Benchland', founded_date=date(1950, 1, 1), global_sales=0)
+        for i in range(manufacturers)
+    ])
+    makers = list(Manufacturer.objects.filter(name__startswith='Bench Maker').order_by('id'))
+    Car.objects.bulk_create([
+        Car(manufacturer=makers[i % len(makers)], model=f'Bench {i}', year=2000 + i % 25,
+            transmission='Automatic' if i % 2 else 'Manual', price_per_day_usd=20 + i % 80)
+        for i in range(cars)
+    ])
+    return list(Car.objects.order_by('id').values_list('id', flat=True))
+
+
+def generate_loans(car_prices, user_ids, loans, rng, today=None):
+    """Yields (car_id, user_id, returned, rent_date, return_date, total_price)
+    rows for returned loans spread over the cars, each car's periods walking
+    back from yesterday with at least a day between them, so no two overlap."""
+    today = today or date.today()
+    per_car, extra = divmod(loans, len(car_prices))
+    max_step = min(35, MAX_HISTORY_DAYS // max(per_car + 1, 1))
+    if loans and max_step < 2:
+        raise ValueError(f"{loans} loans do not fit on {len(car_prices)} cars; seed more cars.")
+    randint, choice = rng.randint, rng.choice
+    for index, (car_id, price) in enumerate(car_prices):
+        return_date = today - timedelta(days=randint(1, 10))
+        for _ in range(per_car + (1 if index < extra else 0)):
+            step = randint(2, max_step)
+            days = randint(1, step - 1)
+            rent_date = return_date - timedelta(days=days - 1)
+            yield car_id, choice(user_ids), True, rent_date, return_date, price * days
+            return_date = rent_date - timedelta(days=step - days)
+
+
+def insert_rows(model, field_names, rows, batch_size, using='default'):
+    """Bulk inserts plain tuples with executemany, one transaction per batch.
+    Skips model instantiation, which dominates bulk_create at millions of rows.
+    Returns the number of rows inserted."""
+    connection = connections[using]
+    fields = [model._meta.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table), ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)))
+    # Dates, decimals and JSON need the backend's representation; other values pass through.
+    preparers = [(index, field) for index, field in enumerate(fields)
+                 if field.get_internal_type() in ('DateField', 'DecimalField', 'JSONField')]
+    inserted = 0
+    batch = []
+
+    def flush():
+        prepared = []
+        for row in batch:
+            row = list(row)
+            for index, field in preparers:
+                row[index] = field.get_db_prep_save(row[index], connection)
+            prepared.append(row)
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.executemany(sql, prepared)
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+            inserted += len(batch)
+            batch = []
+    if batch:
+        flush()
+        inserted += len(batch)
+    return inserted
+
+
+def placeholder_images(count, rng):
+    """JPEG bytes of `count` distinct solid-colour photos."""
+    from io import BytesIO
+    from PIL import Image
+    images = []
+    for _ in range(count):
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), (rng.randrange(256), rng.randrange(256), rng.randrange(256))).save(
+            buffer, 'JPEG', quality=80)
+        images.append(buffer.getvalue())
+    return images
+
+
+def seed_fleet(manufacturers=20, cars=1000, loans=100000, users=100, images=0, distinct_images=16,
+               batch_size=5000, seed=0, prefix='Bench', progress=None):
+    """Seeds a synthetic fleet with batched inserts, then fills the derived
+    tables (search trigrams, rental counters) for the new cars only; rows that
+    were already there are left alone. Deterministic for a given seed.
+    Rows are named after `prefix`, so seeding again needs a new prefix."""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.files.base import ContentFile
+    from .catalog_cache import invalidate
+    from .images import image_storage
+    from .leaderboard import rebuild_rental_stats
+    from .models import Car, CarImage, Loan, Manufacturer
+    from .search import index_cars
+
+    rng = random.Random(seed)
+    progress = progress or (lambda message: None)
+    maker_prefix, car_prefix, user_prefix = f'{prefix} Maker ', f'{prefix} Car ', f'{prefix.lower()}_user_'
+
+    Manufacturer.objects.bulk_create([
+        Manufacturer(name=f'{maker_prefix}{i}', country=rng.choice(('Germany', 'Japan', 'France', 'USA', 'Korea')),
+                     founded_date=date(1900 + rng.randint(0, 100), 1, 1), global_sales=rng.uniform(0, 10))
+        for i in range(manufacturers)
+    ], batch_size=batch_size)
+    maker_ids = list(Manufacturer.objects.filter(name__startswith=maker_prefix).values_list('id', flat=True))
+
+    insert_rows(Car, ('manufacturer', 'model', 'year', 'transmission', 'price_per_day_usd', 'available',
+                      'rental_count', 'revenue_usd'),
+                ((rng.choice(maker_ids), f'{car_prefix}{i}', rng.randint(2000, 2025),
+                  rng.choice(('Automatic', 'Manual')), Decimal(rng.randint(2000, 20000)) / 100, True, 0, Decimal(0))
+                 for i in range(cars)), batch_size)
+    car_prices = list(Car.objects.filter(model__startswith=car_prefix).order_by('id')
+                      .values_list('id', 'price_per_day_usd'))
+    progress(f"{len(car_prices)} cars")
+
+    # Hashing is deliberately slow; every seeded user shares one hash.
+    password = make_password(f'{prefix.lower()}-pass')
+    User.objects.bulk_create([User(username=f'{user_prefix}{i}', password=password) for i in range(users)],
+                             batch_size=batch_size)
+    user_ids = list(User.objects.filter(username__startswith=user_prefix).values_list('id', flat=True))
+    progress(f"{len(user_ids)} users")
+
+    created = 0
+    rows = generate_loans(car_prices, user_ids, loans, rng)
+    fields = ('car', 'user', 'returned', 'rent_date', 'return_date', 'total_price')
+    # One chunk per batch, so progress is reported as it goes.
+    while inserted := insert_rows(Loan, fields, islice(rows, batch_size), batch_size):
+        created += inserted
+        progress(f"{created} loans")
+
+    image_count = 0
+    if images:
+        # Cars share a few distinct photos; content-addressed storage keeps one file each.
+        storage = image_storage()
+        names = [storage.save(f'cars/{prefix.lower()}.jpg', ContentFile(data))
+                 for data in placeholder_images(distinct_images, rng)]
+        image_count = insert_rows(CarImage, ('car', 'image', 'variants'),
+                                  ((car_id, names[i % len(names)], {})
+                                   for i, (car_id, _) in enumerate(car_prices[:images])), batch_size)
+        progress(f"{image_count} images")
+
+    # The new cars have no other loans, so their stats are exactly the seeded ones.
+    car_ids = [car_id for car_id, _ in car_prices]
+    for start in range(0, len(car_ids), batch_size):
+        batch = car_ids[start:start + batch_size]
+        index_cars(Car.objects.select_related('manufacturer').only('id', 'model', 'manufacturer__name')
+                   .filter(id__in=batch))
+        rebuild_rental_stats(car_ids=batch)
+    invalidate(Manufacturer, Car, Loan, CarImage)
+    return {'manufacturers': len(maker_ids), 'cars': len(car_prices), 'users': len(user_ids), 'loans': created,
+            'images': image_count}
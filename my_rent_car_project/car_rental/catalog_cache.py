@@ -0,0 +1,146 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+CATALOG_CACHE_ALIAS = 'catalog'
+
+# Models each cached query shape reads; a write to any of them changes the shape's keys.
+SHAPE_DEPENDENCIES = {
+    'manufacturers': ('manufacturer',),
+    'car_list': ('car', 'manufacturer', 'loan'),
+    'search': ('car', 'manufacturer', 'carimage', 'loan'),
+    'top_cars': ('car', 'loan'),
+}
+
+# Shapes whose results depend on today's date (the top_cars ?days= windows),
+# so their keys and ETags change at midnight even without a write.
+DAILY_SHAPES = {'top_cars'}
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def get_cache():
+    return caches[CATALOG_CACHE_ALIAS]
+
+
+def _epoch_timeout():
+    return settings.CATALOG_CACHE_TIMEOUT
+
+
+def _cache_epoch():
+    # Random per cache instance: with a per-process locmem cache two workers
+    # can hold the same version numbers for different data, and must not
+    # hand out the same ETag. The epoch expires after CATALOG_CACHE_TIMEOUT,
+    # taking the versions scoped to it along, so a worker that never sees a
+    # write still moves to fresh keys and ETags within that time.
+    cache = get_cache()
+    epoch = cache.get('catalog:epoch')
+    if epoch is None:
+        cache.add('catalog:epoch', uuid.uuid4().hex[:8], timeout=_epoch_timeout())
+        epoch = cache.get('catalog:epoch')
+    return epoch
+
+
+def _version_key(epoch, model_name):
+    return f'catalog:version:{epoch}:{model_name}'
+
+
+def _modified_key(epoch, model_name):
+    return f'catalog:modified:{epoch}:{model_name}'
+
+
+def bump_versions(*model_names):
+    cache = get_cache()
+    epoch = _cache_epoch()
+    for model_name in model_names:
+        try:
+            cache.incr(_version_key(epoch, model_name))
+        except ValueError:
+            cache.set(_version_key(epoch, model_name), 1, timeout=_epoch_timeout())
+    cache.set_many({_modified_key(epoch, name): time.time() for name in model_names}, timeout=_epoch_timeout())
+
+
+def invalidate(*models):
+    """Moves every shape that reads these models to fresh keys. Versions are
+    bumped right away and again on commit, so a read that cached pre-commit
+    data in between is not served afterwards."""
+    model_names = [model._meta.model_name for model in models]
+    bump_versions(*model_names)
+    transaction.on_commit(lambda: bump_versions(*model_names))
+
+
+def _version_stamp(shape):
+    epoch = _cache_epoch()
+    model_names = SHAPE_DEPENDENCIES[shape]
+    versions = get_cache().get_many([_version_key(epoch, name) for name in model_names])
+    stamp = '.'.join(str(versions.get(_version_key(epoch, name), 0)) for name in model_names)
+    if shape in DAILY_SHAPES:
+        stamp = f'{stamp}.{date.today().isoformat()}'
+    return f'{epoch}-{stamp}'
+
+
+def catalog_etag(shape):
+    return f'{shape}-{_version_stamp(shape)}'
+
+
+def last_write(shape):
+    """Latest write time of the models behind this shape, as a timestamp.
+    Models not written in the current cache epoch count as modified at its
+    start, and daily shapes as modified at midnight at the earliest."""
+    cache = get_cache()
+    epoch = _cache_epoch()
+    keys = [_modified_key(epoch, name) for name in SHAPE_DEPENDENCIES[shape]]
+    stamps = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, now, timeout=_epoch_timeout())
+            stamps[key] = cache.get(key, now)
+    if shape in DAILY_SHAPES:
+        stamps['midnight'] = datetime.combine(date.today(), datetime.min.time()).timestamp()
+    return max(stamps.values())
+
+
+def catalog_last_modified(shape):
+    return datetime.fromtimestamp(int(last_write(shape)), tz=timezone.utc)
+
+
+def make_key(shape, params):
+    stamp = _version_stamp(shape)
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'catalog:{shape}:{stamp}:{digest}'
+
+
+def cached_read(shape, params, compute, timeout=None):
+    """Returns the cached result for this shape and parameters, computing and
+    storing it on a miss."""
+    cache = get_cache()
+    key = make_key(shape, params)
+    result = cache.get(key)
+    with _stats_lock:
+        _stats[shape]['hits' if result is not None else 'misses'] += 1
+    if result is None:
+        result = compute()
+        if timeout is None:
+            cache.set(key, result)
+        else:
+            cache.set(key, result, timeout)
+    return result
+
+
+def cache_stats():
+    with _stats_lock:
+        return {shape: dict(counts) for shape, counts in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
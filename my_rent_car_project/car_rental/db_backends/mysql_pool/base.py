@@ -0,0 +1,6 @@
+from django.db.backends.mysql import base
+from car_rental.db_pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import deque
+from functools import partial
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
+
+POOL_DEFAULTS = {
+    'max_size': 10,
+    # Seconds to wait for a free connection before giving up.
+    'timeout': 10,
+    # Connections are replaced after this many seconds, and after max_idle
+    # seconds unused, well before the server's wait_timeout drops them.
+    'max_lifetime': 1800,
+    'max_idle': 600,
+    # Ping a connection before handing it out.
+    'check': True,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(DatabaseError):
+    pass
+
+
+class ConnectionPool:
+    """Process-wide pool of raw DB-API connections for one database alias,
+    shared by the per-thread Django connection wrappers. At most max_size
+    connections exist; callers past that wait up to `timeout` seconds."""
+
+    def __init__(self, connect, max_size, timeout, max_lifetime, max_idle, check):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check = check
+        self._idle = deque()
+        self._created_at = {}
+        self._condition = threading.Condition()
+        self._opening = 0
+        self.opened = 0
+        self.waiting = 0
+
+    @property
+    def size(self):
+        return len(self._created_at) + self._opening
+
+    def _expired(self, connection, released_at, now):
+        return (now - self._created_at[id(connection)] > self.max_lifetime
+                or now - released_at > self.max_idle)
+
+    def _checkout(self, deadline):
+        # Returns (idle connection or None to open one, stale connections to close).
+        stale = []
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._idle:
+                    connection, released_at = self._idle.pop()
+                    if not self._expired(connection, released_at, now):
+                        return connection, stale
+                    del self._created_at[id(connection)]
+                    stale.append(connection)
+                if self.size < self.max_size:
+                    self._opening += 1
+                    return None, stale
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolTimeout(f'No database connection free within {self.timeout}s '
+                                      f'({self.max_size} in use).')
+                self.waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection, stale = self._checkout(deadline)
+            for old in stale:
+                self._close_quietly(old)
+            if connection is None:
+                return self._open()
+            if not self.check or self._ping(connection):
+                return connection
+            self.release(connection, discard=True)
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opening -= 1
+            self._created_at[id(connection)] = time.monotonic()
+            self.opened += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        with self._condition:
+            if discard:
+                self._created_at.pop(id(connection), None)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+        if discard:
+            self._close_quietly(connection)
+
+    def close_all(self):
+        with self._condition:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            for connection in idle:
+                del self._created_at[id(connection)]
+        for connection in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        with self._condition:
+            return {'size': self.size, 'idle': len(self._idle), 'in_use': self.size - len(self._idle),
+                    'waiting': self.waiting, 'opened': self.opened, 'max_size': self.max_size}
+
+    @staticmethod
+    def _ping(connection):
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def get_pool(alias):
+    with _pools_lock:
+        return _pools.get(alias)
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def close_pool(alias):
+    with _pools_lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None:
+        pool.close_all()
+
+
+class PooledConnectionMixin:
+    """Mixed into a backend's DatabaseWrapper: connect() checks a connection
+    out of the alias's pool and close() returns it, instead of opening and
+    closing a socket per request. Configured by OPTIONS['pool']."""
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def _get_pool(self, conn_params):
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                if self.settings_dict['CONN_MAX_AGE'] != 0:
+                    raise ImproperlyConfigured('Pooling does not support persistent connections; '
+                                               'set CONN_MAX_AGE to 0.')
+                options = {**POOL_DEFAULTS, **(self.settings_dict['OPTIONS'].get('pool') or {})}
+                pool = _pools[self.alias] = ConnectionPool(
+                    partial(super().get_new_connection, conn_params), **options)
+            return pool
+
+    def get_new_connection(self, conn_params):
+        return self._get_pool(conn_params).acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # A connection left mid-transaction or broken is not handed to anyone else.
+        discard = (self.in_atomic_block or not self.autocommit
+                   or (self.errors_occurred and not self.is_usable()))
+        get_pool(self.alias).release(self.connection, discard=discard)
@@ -0,0 +1,103 @@
+import math
+import time
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .catalog_cache import last_write
+
+# Set to make a request pin its client to the primary for DATABASE_REPLICA_LAG seconds.
+PIN_COOKIE = 'primary_pin'
+
+_replica = ContextVar('car_rental_replica', default=None)
+_writes = ContextVar('car_rental_writes', default=None)
+
+
+def replica_alias():
+    alias = settings.DATABASE_REPLICA_ALIAS
+    return alias if alias in settings.DATABASES else None
+
+
+def read_from_replica(shape):
+    """Runs the view's car_rental reads on the replica. The primary is used
+    instead for a client that wrote in the last DATABASE_REPLICA_LAG seconds
+    (PIN_COOKIE), and for everyone while the models behind `shape` were
+    written that recently, so neither the catalog cache nor an ETag ever
+    captures a replica that has not caught up."""
+    def use_replica(request):
+        alias = replica_alias()
+        if (alias is None or request.COOKIES.get(PIN_COOKIE)
+                or time.time() - last_write(shape) < settings.DATABASE_REPLICA_LAG):
+            return None
+        return alias
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                token = _replica.set(use_replica(request))
+                try:
+                    return await view_func(request, *args, **kwargs)
+                finally:
+                    _replica.reset(token)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            token = _replica.set(use_replica(request))
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                _replica.reset(token)
+        return wrapper
+    return decorator
+
+
+class ReplicaRouter:
+    """Writes always go to the primary, including saves of rows read from the
+    replica. Reads go to the replica only inside read_from_replica views and
+    outside a transaction; everything else reads the primary."""
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if (alias is None or model._meta.app_label != 'car_rental'
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and model._meta.app_label == 'car_rental':
+            writes.append(model._meta.model_name)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Sets PIN_COOKIE on the response of a request that wrote car_rental
+    rows (a booking, a return), so the same client reads its own writes from
+    the primary until the replica has them."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if replica_alias() is None:
+            return self.get_response(request)
+        # A list, not a flag: the router appends to it from whatever context the view runs in.
+        token = _writes.set([])
+        try:
+            response = self.get_response(request)
+            wrote = bool(_writes.get())
+        finally:
+            _writes.reset(token)
+        if wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=math.ceil(settings.DATABASE_REPLICA_LAG),
+                                httponly=True, samesite='Lax')
+        return response
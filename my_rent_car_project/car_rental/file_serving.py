@@ -0,0 +1,137 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+RANGE_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Precompressed siblings written by collectstatic, in order of preference.
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def resolve(document_root, path):
+    try:
+        full_path = safe_join(document_root, path)
+    except ValueError:
+        raise Http404('Invalid path')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+    return full_path
+
+
+def parse_range(header, size):
+    """Returns (start, end) inclusive for a single byte range, None when the
+    header should be ignored, or False when it cannot be satisfied."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        # Malformed and multi-range requests get the whole file.
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def iter_range(file_obj, start, length):
+    with file_obj:
+        file_obj.seek(start)
+        while length > 0:
+            chunk = file_obj.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload_response(full_path, path):
+    # The web server streams the file; the worker only sends headers.
+    response = HttpResponse()
+    if settings.MEDIA_OFFLOAD == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        response['X-Accel-Redirect'] = settings.MEDIA_OFFLOAD_PREFIX.rstrip('/') + '/' + quote(path)
+    del response['Content-Type']
+    return response
+
+
+def file_response(request, full_path, path, cache_control, content_type=None, encoding=None, offload=False):
+    stat = os.stat(full_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        not_modified['Cache-Control'] = cache_control
+        return not_modified
+
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    if offload:
+        response = offload_response(full_path, path)
+    else:
+        byte_range = None
+        if 'Range' in request.headers and encoding is None and if_range_matches(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.headers['Range'], stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(iter_range(open(full_path, 'rb'), start, end - start + 1), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(full_path, 'rb'))
+            response['Content-Length'] = str(stat.st_size)
+        response['Accept-Ranges'] = 'bytes' if encoding is None else 'none'
+
+    response['Content-Type'] = content_type
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def precompressed_path(request, full_path):
+    accepted = accepted_encodings(request)
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            return full_path + suffix, encoding
+    return full_path, None
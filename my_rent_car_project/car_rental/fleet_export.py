@@ -0,0 +1,55 @@
+import csv
+import json
+from operator import attrgetter, itemgetter
+from .models import Car, Loan, LoanArchive, Manufacturer
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_SPECS = {
+    'cars': (Car, ['id', 'manufacturer_id', 'manufacturer__name', 'model', 'year', 'transmission',
+                   'price_per_day_usd', 'available']),
+    'loans': (Loan, ['id', 'car_id', 'user_id', 'rent_date', 'return_date', 'returned', 'total_price']),
+    'archived_loans': (LoanArchive, ['id', 'car_id', 'user_id', 'rent_date', 'return_date', 'returned',
+                                     'total_price']),
+    'manufacturers': (Manufacturer, ['id', 'name', 'country', 'founded_date', 'global_sales']),
+}
+
+
+class Echo:
+    # File-like object for csv.writer that hands back each line instead of storing it.
+    def write(self, value):
+        return value
+
+
+def keyset_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE, key=attrgetter('id')):
+    """Yields the queryset's rows in id order as lists of at most `chunk_size`,
+    one `id > last` query per chunk. Unlike iterator(), which mysqlclient
+    serves from a fully buffered result, memory stays bounded by the chunk.
+    `key` reads the id from a row (itemgetter(0) for values_list rows)."""
+    queryset = queryset.order_by('id')
+    last_id = None
+    while True:
+        chunk = list((queryset if last_id is None else queryset.filter(id__gt=last_id))[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = key(chunk[-1])
+
+
+def iter_export(kind, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields the export one line at a time, reading rows in keyset chunks."""
+    model, fields = EXPORT_SPECS[kind]
+    # manufacturer__name is written as manufacturer_name, matching import_fleet.
+    headers = [field.replace('__', '_') for field in fields]
+    # Every spec lists id first.
+    rows = (row for chunk in keyset_chunks(model.objects.values_list(*fields), chunk_size, key=itemgetter(0))
+            for row in chunk)
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), default=str) + '\n'
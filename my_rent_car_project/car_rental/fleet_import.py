@@ -0,0 +1,151 @@
+import csv
+import json
+import math
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max
+from .models import Car, Manufacturer
+from .search import index_cars
+from .catalog_cache import invalidate
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+IMPORT_KINDS = ('cars', 'manufacturers')
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+class RowError(Exception):
+    pass
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+def iter_rows(stream, fmt):
+    """Yields (line_number, row_dict) from a text stream without reading the whole file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            yield line_number, row
+
+
+def _required(row, key):
+    value = row.get(key)
+    if value is None or str(value).strip() == '':
+        raise RowError(f'{key} is required.')
+    return str(value).strip()
+
+
+def _validate(obj, exclude=()):
+    # Field checks only (lengths, decimal digits, finite numbers, int ranges):
+    # foreign keys and uniqueness are resolved against the lookup tables.
+    try:
+        obj.full_clean(exclude=exclude, validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        raise RowError(' '.join(f'{field}: {" ".join(messages)}' for field, messages in e.message_dict.items()))
+    return obj
+
+
+def build_car(row, manufacturer_ids):
+    name = _required(row, 'manufacturer_name')
+    manufacturer_id = manufacturer_ids.get(name)
+    if manufacturer_id is None:
+        raise RowError(f"Manufacturer '{name}' not found.")
+    try:
+        year = int(_required(row, 'year'))
+    except ValueError:
+        raise RowError('year must be an integer.')
+    try:
+        price = Decimal(_required(row, 'price_per_day_usd'))
+    except InvalidOperation:
+        raise RowError('price_per_day_usd must be a number.')
+    available = str(row.get('available', 'true')).strip().lower() not in ['false', '0']
+    car = Car(manufacturer_id=manufacturer_id, model=_required(row, 'model'), year=year,
+              transmission=(row.get('transmission') or None), price_per_day_usd=price,
+              available=available)
+    return _validate(car, exclude=['manufacturer'])
+
+
+def build_manufacturer(row, manufacturer_ids):
+    name = _required(row, 'name')
+    if name in manufacturer_ids:
+        raise RowError(f"A manufacturer named '{name}' already exists.")
+    try:
+        founded_date = datetime.strptime(_required(row, 'founded_date'), '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError('founded_date must be in YYYY-MM-DD format.')
+    global_sales = row.get('global_sales')
+    try:
+        global_sales = float(global_sales) if global_sales not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        raise RowError('global_sales must be a number.')
+    if not math.isfinite(global_sales):
+        raise RowError('global_sales must be a number.')
+    manufacturer = Manufacturer(name=name, country=(row.get('country') or 'Unknown'), founded_date=founded_date,
+                                global_sales=global_sales)
+    return _validate(manufacturer)
+
+
+def _flush_cars(batch):
+    with transaction.atomic():
+        last_id = Car.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        Car.objects.bulk_create(batch)
+    # bulk_create skips post_save and does not return ids on MySQL, so index
+    # everything inserted after the previous highest id.
+    index_cars(Car.objects.filter(id__gt=last_id).select_related('manufacturer'))
+    invalidate(Car)
+
+
+def import_fleet(rows, kind='cars', batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Imports rows in batches and returns a report of created rows and per-row
+    errors. Each error gives the 1-based data row and its line in the file
+    (the last one, for a CSV row spanning several lines)."""
+    manufacturer_ids = dict(Manufacturer.objects.values_list('name', 'id'))
+    build = build_car if kind == 'cars' else build_manufacturer
+    report = {'processed': 0, 'created': 0, 'failed': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        if kind == 'cars':
+            _flush_cars(batch)
+        else:
+            Manufacturer.objects.bulk_create(batch)
+            invalidate(Manufacturer)
+        report['created'] += len(batch)
+        batch.clear()
+        if progress:
+            progress(report)
+
+    for line_number, row in rows:
+        report['processed'] += 1
+        try:
+            if not isinstance(row, dict):
+                raise RowError('Row is not a valid object.')
+            obj = build(row, manufacturer_ids)
+        except RowError as e:
+            report['failed'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': report['processed'], 'line': line_number, 'message': str(e)})
+            continue
+        if kind == 'manufacturers':
+            # Reserve the name so duplicates later in the file are reported.
+            manufacturer_ids[obj.name] = None
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return report
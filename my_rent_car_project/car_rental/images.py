@@ -0,0 +1,124 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image
+from .models import CarImage
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+
+
+def image_storage():
+    return CarImage._meta.get_field('image').storage
+
+
+def get_grace_seconds():
+    return getattr(settings, 'CAR_IMAGE_GRACE_SECONDS', 3600)
+
+
+def get_variant_widths():
+    return getattr(settings, 'CAR_IMAGE_VARIANT_WIDTHS', (320, 640, 1280))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'CAR_IMAGE_WORKERS', 2),
+                                       thread_name_prefix='car-image-variants')
+    return _executor
+
+
+def build_variants(original_name):
+    """Writes a JPEG and a WebP copy of the image at each configured width no
+    larger than the original, and returns their storage names by width."""
+    storage = image_storage()
+    with storage.open(original_name) as original_file:
+        original = Image.open(original_file)
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    stem = os.path.splitext(os.path.basename(original_name))[0]
+    widths = [width for width in get_variant_widths() if width < original.width] or [original.width]
+    variants = {}
+    for width in widths:
+        resized = original.copy()
+        resized.thumbnail((width, round(original.height * width / original.width) or 1), Image.LANCZOS)
+        variants[str(width)] = {}
+        for key, (pil_format, extension, options) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = storage.save(f'cars/variants/{stem}_{width}w.{extension}', ContentFile(buffer.getvalue()))
+            variants[str(width)][key] = name
+    return variants
+
+
+def generate_variants(car_image_id):
+    car_image = CarImage.objects.filter(id=car_image_id).first()
+    if car_image is None or not car_image.image:
+        return
+    car_image.variants = build_variants(car_image.image.name)
+    car_image.save(update_fields=['variants'])
+
+
+def _generate_in_worker(car_image_id):
+    try:
+        generate_variants(car_image_id)
+    except Exception:
+        logger.exception('Could not build image variants for CarImage %s', car_image_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(car_image_id):
+    """Builds the variants on the background pool once the upload is committed,
+    or inline when CAR_IMAGE_VARIANTS_ASYNC is off."""
+    if getattr(settings, 'CAR_IMAGE_VARIANTS_ASYNC', True):
+        transaction.on_commit(lambda: _get_executor().submit(_generate_in_worker, car_image_id))
+    else:
+        transaction.on_commit(lambda: generate_variants(car_image_id))
+
+
+def variant_urls(car_image):
+    """Returns (thumbnail_url, srcset, webp_srcset) for the serialized car."""
+    variants = car_image.variants or {}
+    if not variants:
+        return '', '', ''
+    storage = image_storage()
+    widths = sorted(variants, key=int)
+    thumbnail_url = storage.url(variants[widths[0]]['jpeg'])
+    srcset = ', '.join(f"{storage.url(variants[width]['jpeg'])} {width}w" for width in widths)
+    webp_srcset = ', '.join(f"{storage.url(variants[width]['webp'])} {width}w" for width in widths)
+    return thumbnail_url, srcset, webp_srcset
+
+
+def image_file_names(name, variants):
+    return [name] + [variant for formats in (variants or {}).values() for variant in formats.values()]
+
+
+def release_image_files(name, variants):
+    """Deletes an image's original and variant files once no CarImage row
+    references the original any more; identical uploads share the files.
+    An original saved within CAR_IMAGE_GRACE_SECONDS may belong to an upload
+    whose row is not committed yet, so it is left for gc_car_images."""
+    if not name or CarImage.objects.filter(image=name).exists():
+        return
+    storage = image_storage()
+    try:
+        if time.time() - os.path.getmtime(storage.path(name)) < get_grace_seconds():
+            return
+    except FileNotFoundError:
+        pass
+    for file_name in image_file_names(name, variants):
+        storage.delete(file_name)
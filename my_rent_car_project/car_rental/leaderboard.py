@@ -0,0 +1,99 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import connections, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Car, CarRentalDailyStats, Loan, LoanArchive
+
+LEADERBOARD_WINDOWS = (7, 30, 365)
+
+
+def record_daily_stats(loans):
+    """Adds new loans to the per-car, per-rent-date buckets. Call it inside the
+    booking transaction, after the cars have been claimed, so no two writers
+    race on the same car's bucket."""
+    increments = defaultdict(lambda: [0, 0])
+    for loan in loans:
+        bucket = increments[(loan.car_id, loan.rent_date)]
+        bucket[0] += 1
+        bucket[1] += loan.total_price
+    if not increments:
+        return
+
+    keys = Q()
+    for car_id, day in increments:
+        keys |= Q(car_id=car_id, day=day)
+    existing = list(CarRentalDailyStats.objects.select_for_update().filter(keys))
+    for stats in existing:
+        rentals, revenue = increments.pop((stats.car_id, stats.day))
+        stats.rentals += rentals
+        stats.revenue_usd += revenue
+
+    CarRentalDailyStats.objects.bulk_update(existing, ['rentals', 'revenue_usd'])
+    CarRentalDailyStats.objects.bulk_create([
+        CarRentalDailyStats(car_id=car_id, day=day, rentals=rentals, revenue_usd=revenue)
+        for (car_id, day), (rentals, revenue) in increments.items()
+    ])
+
+
+def get_leaderboard(limit=10, days=None):
+    """Top cars by rentals: all time from the Car counters, or over the last
+    `days` days from the daily buckets."""
+    if days is None:
+        return list(Car.objects.annotate(rentals=F('rental_count'), revenue=F('revenue_usd'))
+                    .order_by('-rental_count', 'id')[:limit])
+
+    today = date.today()
+    ranked = list(CarRentalDailyStats.objects
+                  .filter(day__gt=today - timedelta(days=days), day__lte=today)
+                  .values('car_id')
+                  .annotate(rentals=Sum('rentals'), revenue=Sum('revenue_usd'))
+                  .order_by('-rentals', 'car_id')[:limit])
+    cars = Car.objects.in_bulk([row['car_id'] for row in ranked])
+    top_cars = []
+    for row in ranked:
+        car = cars[row['car_id']]
+        car.rentals = row['rentals']
+        car.revenue = row['revenue']
+        top_cars.append(car)
+    return top_cars
+
+
+def rebuild_rental_stats(car_ids=None):
+    """Recomputes the counters and daily buckets from the loans table and the
+    loans archive, for every car or only for `car_ids`. Both run as single
+    set-based statements, so millions of loans never pass through Python.
+    Migrations keep their own frozen copies."""
+    def scoped(manager, field):
+        return manager.all() if car_ids is None else manager.filter(**{f'{field}__in': car_ids})
+
+    using = CarRentalDailyStats.objects.db
+    sources = (Loan, LoanArchive)
+    with transaction.atomic(using=using):
+        rentals = revenue = None
+        for source in sources:
+            car_loans = source.objects.filter(car_id=OuterRef('pk')).order_by().values('car_id')
+            count = Coalesce(Subquery(car_loans.annotate(rentals=Count('id')).values('rentals')), 0)
+            total = Coalesce(Subquery(car_loans.annotate(revenue=Sum('total_price')).values('revenue')),
+                             Value(Decimal(0)), output_field=DecimalField())
+            rentals = count if rentals is None else rentals + count
+            revenue = total if revenue is None else revenue + total
+        scoped(Car.objects, 'id').update(rental_count=rentals, revenue_usd=revenue)
+
+        scoped(CarRentalDailyStats.objects, 'car_id').delete()
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        selects = [scoped(source.objects, 'car_id').values('car_id', 'rent_date', 'total_price').order_by()
+                   .query.get_compiler(using=using).as_sql() for source in sources]
+        car_id, rent_date, total_price = (quote(Loan._meta.get_field(name).column)
+                                          for name in ('car', 'rent_date', 'total_price'))
+        columns = ', '.join(quote(CarRentalDailyStats._meta.get_field(name).column)
+                            for name in ('car', 'day', 'rentals', 'revenue_usd'))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(CarRentalDailyStats._meta.db_table)} ({columns}) '
+                f'SELECT {car_id}, {rent_date}, COUNT(*), SUM({total_price}) '
+                f'FROM ({" UNION ALL ".join(sql for sql, _ in selects)}) all_loans '
+                f'GROUP BY {car_id}, {rent_date}',
+                [param for _, params in selects for param in params])
@@ -0,0 +1,41 @@
+import time
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from car_rental.archive import ARCHIVE_BATCH_SIZE, archive_loans
+
+
+class Command(BaseCommand):
+    help = ('Moves returned loans that ended before a cutoff from the loans table to loans_archive, '
+            'in batches, so booking conflict checks and rental history scan only recent loans. '
+            'Archived loans still count in the leaderboard and can be listed with my-rentals/?archived=1.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=365,
+                            help='Archive loans returned more than this many days ago.')
+        parser.add_argument('--before', help='Archive loans returned before this date (YYYY-MM-DD) instead.')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD format.')
+        else:
+            cutoff = date.today() - timedelta(days=options['older_than_days'])
+        if cutoff > date.today():
+            raise CommandError('The cutoff cannot be in the future.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        started = time.perf_counter()
+
+        def progress(moved):
+            self.stdout.write(f"[{time.perf_counter() - started:8.1f}s] {moved} loans archived")
+
+        moved = archive_loans(cutoff, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                              progress=progress)
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {moved} loans returned before {cutoff} in {time.perf_counter() - started:.1f}s."))
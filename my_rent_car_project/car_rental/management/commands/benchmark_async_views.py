@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import date, timedelta
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from car_rental.availability import availability
+from car_rental.benchmarks import run_concurrently, seed_small_fleet, test_database
+
+ENDPOINTS = {
+    'search_car': ('/car/search/', '/api/async/cars/search/'),
+    'rent_car': ('/rent_car/', '/api/async/rent_car/'),
+    'return_car': ('/return_car/', '/api/async/return_car/'),
+    'add_car': ('/cars/add/', '/api/async/cars/add/'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Compares throughput of each sync view and its async counterpart (same requests, same responses) '
+            'at high concurrency, served through the ASGI request path on a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--output', help='Also write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        with test_database():
+            availability.reset()
+            car_ids = seed_small_fleet(cars=4 * options['requests'])
+            user = User.objects.create_superuser(username='bench', password='bench-pass')
+            results = asyncio.run(self.run_all(user, car_ids, options['requests'], options['concurrency']))
+            availability.reset()
+
+        self.stdout.write(f"{'endpoint':<12} {'mode':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+        for name, modes in results.items():
+            for mode, summary in modes.items():
+                self.stdout.write(f"{name:<12} {mode:<6} {summary['throughput_rps']:>9} "
+                                  f"{summary['p50_ms']:>9} {summary['p95_ms']:>9} {summary['errors']:>7}")
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    async def run_all(self, user, car_ids, total, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        results = {}
+        for name, urls in ENDPOINTS.items():
+            results[name] = {}
+            for mode, url in zip(('sync', 'async'), urls):
+                # Each mode books and returns its own block of cars.
+                offset = (0 if mode == 'sync' else 2 * total) + (total if name == 'return_car' else 0)
+                request = self.request_factory(client, name, url, car_ids, offset)
+                if name == 'return_car':
+                    await self.book_cars(user, car_ids[offset:offset + total])
+                results[name][mode] = await run_concurrently(request, total, concurrency)
+        return results
+
+    @staticmethod
+    @sync_to_async
+    def book_cars(user, car_ids):
+        from car_rental.views import book_car
+        start = date.today() + timedelta(days=30)
+        for car_id in car_ids:
+            book_car(user, car_id, start, start + timedelta(days=2))
+
+    @staticmethod
+    def request_factory(client, name, url, car_ids, offset):
+        start = date.today() + timedelta(days=1)
+
+        async def request(i):
+            if name == 'search_car':
+                return await client.get(url, {'available': 'true', 'limit': 20, 'after_id': car_ids[i % len(car_ids)]})
+            if name == 'rent_car':
+                payload = {'car_id': car_ids[offset + i], 'start_date': str(start),
+                           'end_date': str(start + timedelta(days=3))}
+            elif name == 'return_car':
+                payload = {'car_id': car_ids[offset + i]}
+            else:
+                payload = {'manufacturer_name': 'Bench Maker 0', 'model': f'Async {i}', 'year': 2024,
+                           'transmission': 'Manual', 'price_per_day_usd': '42.00'}
+            return await client.post(url, json.dumps(payload), content_type='application/json')
+        return request
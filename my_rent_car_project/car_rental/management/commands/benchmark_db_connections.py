@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from car_rental.db_pool import POOL_DEFAULTS, PooledConnectionMixin, close_pool, get_pool
+from car_rental.stats import summarize
+
+MODES = ('fresh', 'persistent', 'pooled')
+
+
+class Command(BaseCommand):
+    help = ('Compares ways of getting a database connection per request against the configured '
+            'database: a new connection per request (fresh), one kept per thread (persistent, '
+            'CONN_MAX_AGE) and a shared pool (pooled). Each simulated request goes through '
+            'request_started/request_finished like a real one and runs a single query.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--mode', action='append', choices=MODES, help='Run only this mode; may be repeated.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode, over all threads.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--pool-size', type=int,
+                            help='Pool max_size (default: DB_POOL_MAX_SIZE, or half of --threads).')
+        parser.add_argument('--conn-max-age', type=int, default=600, help='CONN_MAX_AGE for persistent.')
+        parser.add_argument('--query', default='SELECT 1')
+        parser.add_argument('--output', help='Also write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if options['threads'] < 1 or options['requests'] < options['threads']:
+            raise CommandError('Need at least one thread and one request per thread.')
+        if get_pool(alias) is not None:
+            raise CommandError(f'"{alias}" is already pooled in this process.')
+        base_settings = connections.settings[alias]
+        pool_options = {**POOL_DEFAULTS, **(base_settings['OPTIONS'].get('pool') or {})}
+        pool_options['max_size'] = options['pool_size'] or (
+            pool_options['max_size'] if 'pool' in base_settings['OPTIONS'] else max(1, options['threads'] // 2))
+        base_class = type(connections[alias])
+        # With ENGINE set to a pooled backend, time its plain parent instead.
+        base_class = next(cls for cls in base_class.__mro__ if not issubclass(cls, PooledConnectionMixin))
+
+        results = {}
+        for mode in options['mode'] or MODES:
+            settings_dict = dict(base_settings, CONN_MAX_AGE=0, OPTIONS=dict(base_settings['OPTIONS']))
+            settings_dict['OPTIONS'].pop('pool', None)
+            wrapper_class = base_class
+            if mode == 'persistent':
+                settings_dict['CONN_MAX_AGE'] = options['conn_max_age']
+            elif mode == 'pooled':
+                settings_dict['OPTIONS']['pool'] = pool_options
+                wrapper_class = type('PooledDatabaseWrapper', (PooledConnectionMixin, base_class), {})
+            results[mode] = self.run(alias, wrapper_class, settings_dict, options)
+            if mode == 'pooled':
+                results[mode]['pool_size'] = pool_options['max_size']
+                close_pool(alias)
+
+        self.stdout.write(f"{options['requests']} requests per mode on {options['threads']} threads, "
+                          f"{connections[alias].vendor} {alias!r}")
+        self.stdout.write(f"{'mode':<11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>9} {'connects':>9}")
+        for mode, result in results.items():
+            self.stdout.write(f"{mode:<11} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+                              f"{result['throughput_rps']:>9} {result['connects']:>9}")
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'threads': options['threads'], 'vendor': connections[alias].vendor,
+                           'results': results}, output, indent=2)
+
+    @staticmethod
+    def run(alias, wrapper_class, settings_dict, options):
+        latencies = []
+        errors = []
+        connects = []
+        per_thread, extra = divmod(options['requests'], options['threads'])
+
+        def count_connect(sender, connection, **kwargs):
+            if connection.alias == alias:
+                connects.append(1)
+
+        def worker(requests):
+            # Connections are per thread, so each worker installs its own wrapper.
+            connection = connections[alias] = wrapper_class(dict(settings_dict), alias)
+            try:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    request_started.send(sender=Command)
+                    try:
+                        with connection.cursor() as cursor:
+                            cursor.execute(options['query'])
+                            cursor.fetchall()
+                    except Exception as exc:
+                        errors.append(exc)
+                    finally:
+                        request_finished.send(sender=Command)
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+                del connections[alias]
+
+        connection_created.connect(count_connect)
+        threads = [threading.Thread(target=worker, args=(per_thread + (1 if i < extra else 0),))
+                   for i in range(options['threads'])]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connect)
+        result = summarize(latencies, time.perf_counter() - started, len(errors))
+        pool = get_pool(alias)
+        # Pooled checkouts also send connection_created; count real connects.
+        result['connects'] = pool.stats()['opened'] if pool is not None else len(connects)
+        if errors:
+            result['first_error'] = repr(errors[0])
+        return result
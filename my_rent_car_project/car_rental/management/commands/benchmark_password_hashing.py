@@ -0,0 +1,105 @@
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from car_rental.benchmarks import run_sequentially, test_database
+from car_rental.passwords import HashingBusy, run_hashing
+
+
+class Command(BaseCommand):
+    help = ('Measures password hashing cost per algorithm with the configured costs: milliseconds per '
+            'hash, logins/second on one core, and throughput of the bounded hashing pool under a burst. '
+            'With --end-to-end, also times POST /login/ on a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithms', nargs='+', choices=sorted(settings.PASSWORD_HASHER_CLASSES))
+        parser.add_argument('--hashes', type=int, default=20, help='Hashes timed per measurement.')
+        parser.add_argument('--threads', type=int,
+                            help='Request threads hashing at once (default: 4 per pool worker).')
+        parser.add_argument('--end-to-end', action='store_true')
+        parser.add_argument('--output', help='Also write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        algorithms = options['algorithms'] or [name for name in settings.PASSWORD_HASHER_CLASSES
+                                               if self.available(name)]
+        workers = settings.PASSWORD_HASHING_WORKERS
+        threads = options['threads'] or 4 * workers
+        cores = min(workers, os.cpu_count() or 1)
+        results = {}
+        for name in algorithms:
+            with override_settings(PASSWORD_HASHERS=[settings.PASSWORD_HASHER_CLASSES[name]]):
+                results[name] = self.measure(options['hashes'], threads, cores)
+                if options['end_to_end']:
+                    results[name]['login_p50_ms'] = self.login_p50(options['hashes'])
+
+        self.stdout.write(f"{workers} pool workers, {threads} request threads, {cores} cores used")
+        self.stdout.write(f"{'algorithm':<10} {'ms/hash':>9} {'logins/s/core':>14} {'pool logins/s':>14} "
+                          f"{'pool/core':>10}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<10} {result['hash_ms']:>9} {result['logins_per_second_per_core']:>14} "
+                              f"{result['pool_logins_per_second']:>14} {result['pool_logins_per_second_per_core']:>10}")
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'workers': workers, 'threads': threads, 'cores': cores, 'results': results},
+                          output, indent=2)
+
+    @staticmethod
+    def available(name):
+        if name != 'argon2':
+            return True
+        try:
+            import argon2  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @staticmethod
+    def measure(hashes, threads, cores):
+        encoded = make_password('bench-pass')
+        latencies = []
+        for _ in range(hashes):
+            started = time.perf_counter()
+            check_password('bench-pass', encoded)
+            latencies.append(time.perf_counter() - started)
+        mean = statistics.mean(latencies)
+
+        # A burst of logins from `threads` request threads, all going through the pool.
+        burst = hashes * cores
+
+        def login(_):
+            try:
+                run_hashing(check_password, 'bench-pass', encoded)
+                return True
+            except HashingBusy:
+                return False
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as request_threads:
+            served = sum(request_threads.map(login, range(burst)))
+        pool_rate = served / (time.perf_counter() - started)
+        return {
+            'hash': encoded.split('$', 1)[0],
+            'hash_ms': round(mean * 1000, 2),
+            'logins_per_second_per_core': round(1 / mean, 1),
+            'pool_logins_per_second': round(pool_rate, 1),
+            'pool_logins_per_second_per_core': round(pool_rate / cores, 1),
+            'pool_rejected': burst - served,
+        }
+
+    @staticmethod
+    def login_p50(logins):
+        with test_database():
+            User.objects.create_user(username='bench', password='bench-pass')
+            client = Client()
+
+            def login(i):
+                response = client.post('/login/', {'username': 'bench', 'password': 'bench-pass'})
+                client.logout()
+                return response.status_code == 302
+            return run_sequentially(login, logins, warmup=1)['p50_ms']
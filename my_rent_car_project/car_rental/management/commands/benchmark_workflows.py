@@ -0,0 +1,172 @@
+import json
+import platform
+import subprocess
+import time
+from datetime import date, timedelta
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from car_rental.availability import availability
+from car_rental.benchmarks import run_sequentially, seed_fleet, test_database
+from car_rental.models import Car, Loan
+
+SCENARIOS = ('search_car', 'get_all_cars', 'rent_car', 'return_car', 'my_rentals_view', 'top_cars_view')
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'throughput_rps', 'queries_mean')
+
+
+class Command(BaseCommand):
+    help = ('Seeds a synthetic fleet in a throwaway test database and measures latency, throughput '
+            'and SQL queries per request of the main rental workflows. Results can be written as '
+            'JSON and compared against an earlier run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturers', type=int, default=20)
+        parser.add_argument('--cars', type=int, default=1000)
+        parser.add_argument('--loans', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Run only this scenario; may be repeated.')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Replace the catalog cache with a dummy backend so every read hits the database.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against.')
+        parser.add_argument('--max-regression', type=float,
+                            help='With --compare, fail if any p50 got slower by more than this many percent.')
+
+    def handle(self, *args, **options):
+        if options['requests'] > options['cars']:
+            raise CommandError('--requests cannot exceed --cars; rent_car books a different car per request.')
+        scenarios = options['scenario'] or SCENARIOS
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        caches = None
+        if options['no_cache']:
+            caches = {**settings.CACHES, 'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        with test_database(), override_settings(**({'CACHES': caches} if caches else {})):
+            availability.reset()
+            started = time.perf_counter()
+            seeded = seed_fleet(manufacturers=options['manufacturers'], cars=options['cars'],
+                                loans=options['loans'], users=options['users'], seed=options['seed'],
+                                progress=lambda message: self.stderr.write(f"seeding: {message}"))
+            seed_seconds = time.perf_counter() - started
+            results = self.run_scenarios(scenarios, options['requests'], options['warmup'])
+            availability.reset()
+            vendor = connection.vendor
+
+        report = {
+            'meta': {
+                'commit': self.git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'database': vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'catalog_cache': not options['no_cache'],
+                'requests': options['requests'],
+                'seeded': seeded,
+                'seed': options['seed'],
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'results': results,
+        }
+
+        self.stdout.write(f"{'scenario':<16} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'errors':>7}")
+        for name, summary in results.items():
+            self.stdout.write(f"{name:<16} {summary['throughput_rps']:>9} {summary['p50_ms']:>9} "
+                              f"{summary['p95_ms']:>9} {summary['queries_mean']:>8} {summary['errors']:>7}")
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        if baseline is not None:
+            self.compare(baseline, report, options['max_regression'])
+
+    def run_scenarios(self, scenarios, total, warmup):
+        user = User.objects.create_user(username='bench', password='bench-pass')
+        client = Client()
+        client.force_login(user)
+        # The busiest seeded user, so my_rentals pages through a real history.
+        busiest = Loan.objects.values('user_id').annotate(loans=Count('id')).order_by('-loans').first()
+        history_user = User.objects.get(id=busiest['user_id']) if busiest else user
+        history_client = Client()
+        history_client.force_login(history_user)
+        car_ids = list(Car.objects.order_by('id').values_list('id', flat=True))
+        years = sorted(set(Car.objects.values_list('year', flat=True)))
+        start = date.today() + timedelta(days=30)
+        rent_date, end_date = str(start), str(start + timedelta(days=3))
+
+        def search_car(i):
+            params = ({'year': years[i % len(years)], 'min_price': 20 + i % 50}, {'transmission': 'manual'},
+                      {'available': 'true', 'max_price': 40 + i % 150})[i % 3]
+            return client.get('/cars/search/', {**params, 'limit': 20}).status_code == 200
+
+        def get_all_cars(i):
+            sort = ('id', 'price', '-year')[i % 3]
+            return client.get('/cars/', {'sort': sort, 'page_size': 50}).status_code == 200
+
+        def rent_car(i):
+            payload = {'car_id': car_ids[i], 'start_date': rent_date, 'end_date': end_date}
+            response = client.post('/rent_car/', json.dumps(payload), content_type='application/json')
+            return b'You booked successfully!' in response.content
+
+        def return_car(i):
+            response = client.post('/return_car/', json.dumps({'car_id': car_ids[i]}),
+                                   content_type='application/json')
+            return response.json().get('status') == 'success'
+
+        def my_rentals_view(i):
+            query = {} if i % 2 else {'from': str(date.today() - timedelta(days=365))}
+            return history_client.get('/my-rentals/', query).status_code == 200
+
+        def top_cars_view(i):
+            days = (None, 7, 30, 365)[i % 4]
+            return client.get('/top-cars/', {'days': days} if days else {}).status_code == 200
+
+        runners = {'search_car': search_car, 'get_all_cars': get_all_cars, 'rent_car': rent_car,
+                   'return_car': return_car, 'my_rentals_view': my_rentals_view, 'top_cars_view': top_cars_view}
+        results = {}
+        for name in scenarios:
+            # rent_car and return_car walk the same cars, so both skip warmup.
+            scenario_warmup = 0 if name in ('rent_car', 'return_car') else warmup
+            if name == 'return_car' and 'rent_car' not in scenarios:
+                for i in range(total):
+                    rent_car(i)
+            results[name] = run_sequentially(runners[name], total, warmup=scenario_warmup)
+        return results
+
+    def compare(self, baseline, report, max_regression):
+        self.stdout.write(f"\nAgainst {baseline['meta'].get('commit') or 'baseline'}:")
+        regressions = []
+        for name, summary in report['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                continue
+            changes = []
+            for metric in COMPARED_METRICS:
+                old, new = before.get(metric), summary.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * 100
+                changes.append(f"{metric} {old} -> {new} ({change:+.1f}%)")
+                if metric == 'p50_ms' and max_regression is not None and change > max_regression:
+                    regressions.append(name)
+            self.stdout.write(f"{name:<16} " + ', '.join(changes))
+        if regressions:
+            raise CommandError(f"p50 regressed by more than {max_regression}% in: {', '.join(regressions)}")
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
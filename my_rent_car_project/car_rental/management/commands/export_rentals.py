@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from car_rental.fleet_export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_SPECS, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Exports cars, loans or manufacturers as CSV or JSONL, streaming rows in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORT_SPECS))
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write to. Defaults to standard output.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = iter_export(options['kind'], options['format'], chunk_size=options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        try:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                count = 0
+                for line in lines:
+                    output.write(line)
+                    count += 1
+        except OSError as e:
+            raise CommandError(f"Cannot write {options['output']}: {e}")
+        rows = count - 1 if options['format'] == 'csv' else count
+        self.stderr.write(self.style.SUCCESS(f"Exported {rows} {options['kind']} to {options['output']}."))
@@ -0,0 +1,63 @@
+import os
+import time
+from django.conf import settings
+from django.core.files.base import File
+from django.core.management.base import BaseCommand
+from car_rental.images import image_file_names, image_storage
+from car_rental.models import CarImage
+from car_rental.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = ('Deletes car image files no CarImage references. With --rehash, first moves '
+            'images stored under upload names to content-addressed names, merging duplicates.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--grace-seconds', type=int, default=settings.CAR_IMAGE_GRACE_SECONDS,
+                            help='Keep unreferenced files younger than this; they may belong to an upload in progress.')
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        if options['rehash']:
+            self.rehash(storage, options['dry_run'])
+
+        referenced = set()
+        for name, variants in CarImage.objects.values_list('image', 'variants').iterator():
+            referenced.update(image_file_names(name, variants))
+
+        cutoff = time.time() - options['grace_seconds']
+        removed = freed = 0
+        for name in self.walk(storage, 'cars'):
+            if name in referenced or os.path.getmtime(storage.path(name)) > cutoff:
+                continue
+            size = storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(f"Would delete {name}")
+            else:
+                storage.delete(name)
+            removed += 1
+            freed += size
+        verb = 'Would free' if options['dry_run'] else 'Freed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {freed} bytes in {removed} orphaned files."))
+
+    def rehash(self, storage, dry_run):
+        for car_image in CarImage.objects.order_by('id').iterator():
+            if not car_image.image or is_content_addressed(car_image.image.name):
+                continue
+            if dry_run:
+                self.stdout.write(f"Would rehash {car_image.image.name}")
+                continue
+            with storage.open(car_image.image.name) as original:
+                new_name = storage.save(car_image.image.name, File(original))
+            self.stdout.write(f"{car_image.image.name} -> {new_name}")
+            car_image.image.name = new_name
+            car_image.save(update_fields=['image'])
+
+    def walk(self, storage, directory):
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for name in directories:
+            yield from self.walk(storage, f'{directory}/{name}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from car_rental.images import generate_variants
+from car_rental.models import CarImage
+
+
+class Command(BaseCommand):
+    help = 'Builds thumbnail and WebP variants for car images that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild variants for every image.')
+
+    def handle(self, *args, **options):
+        images = CarImage.objects.order_by('id')
+        if not options['all']:
+            images = images.filter(variants={})
+        done = failed = 0
+        for car_image_id in images.values_list('id', flat=True).iterator():
+            try:
+                generate_variants(car_image_id)
+                done += 1
+            except (OSError, ValueError) as e:
+                failed += 1
+                self.stderr.write(f"CarImage {car_image_id}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {done} images, {failed} failed."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from car_rental.fleet_import import (IMPORT_BATCH_SIZE, IMPORT_FORMATS, IMPORT_KINDS, detect_format,
+                                     import_fleet, iter_rows)
+
+
+class Command(BaseCommand):
+    help = 'Imports cars or manufacturers from a CSV or JSONL file in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--kind', choices=IMPORT_KINDS, default='cars')
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='Defaults to jsonl for .jsonl/.json/.ndjson files, csv otherwise.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+
+        def progress(report):
+            self.stdout.write(f"Processed {report['processed']} rows: "
+                              f"{report['created']} created, {report['failed']} failed.")
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = import_fleet(iter_rows(stream, fmt), kind=options['kind'],
+                                      batch_size=options['batch_size'], progress=progress)
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        for error in report['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['message']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Import finished: {report['created']} {options['kind']} created, {report['failed']} rows failed."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from car_rental.catalog_cache import invalidate
+from car_rental.leaderboard import rebuild_rental_stats
+from car_rental.models import Car, CarRentalDailyStats
+
+
+class Command(BaseCommand):
+    help = ('Recomputes per-car rental counters, revenue and daily leaderboard buckets from the loans table '
+            'and the loans archive.')
+
+    def handle(self, *args, **options):
+        rebuild_rental_stats()
+        invalidate(Car)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rental stats rebuilt: {CarRentalDailyStats.objects.count()} daily buckets."))
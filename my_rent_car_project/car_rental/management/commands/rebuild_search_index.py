@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from car_rental.models import CarSearchTrigram
+from car_rental.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the trigram search index over car models and manufacturer names.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index rebuilt with {CarSearchTrigram.objects.count()} trigrams."))
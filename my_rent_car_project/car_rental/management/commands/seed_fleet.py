@@ -0,0 +1,53 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from car_rental.benchmarks import seed_fleet
+from car_rental.models import Car, Manufacturer
+
+
+class Command(BaseCommand):
+    help = ('Fills the configured database with a synthetic fleet for scale testing: manufacturers, cars, '
+            'users, non-overlapping returned loan histories and car images. Output is deterministic for '
+            'a given --seed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturers', type=int, default=50)
+        parser.add_argument('--cars', type=int, default=10000)
+        parser.add_argument('--loans', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--images', type=int, help='Cars that get an image (default: all of them).')
+        parser.add_argument('--distinct-images', type=int, default=16,
+                            help='Distinct photos shared by those cars; storage keeps one file per photo.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='Seed',
+                            help='Names rows "<prefix> Maker N", "<prefix> Car N", "<prefix>_user_N".')
+
+    def handle(self, *args, **options):
+        if min(options['manufacturers'], options['cars'], options['users']) < 1:
+            raise CommandError('--manufacturers, --cars and --users must be at least 1.')
+        prefix = options['prefix']
+        if (Manufacturer.objects.filter(name__startswith=f'{prefix} Maker ').exists()
+                or Car.objects.filter(model__startswith=f'{prefix} Car ').exists()
+                or User.objects.filter(username__startswith=f'{prefix.lower()}_user_').exists()):
+            raise CommandError(f'Rows named after "{prefix}" already exist; pass a different --prefix.')
+
+        started = time.perf_counter()
+
+        def progress(message):
+            self.stdout.write(f"[{time.perf_counter() - started:8.1f}s] {message}")
+
+        try:
+            seeded = seed_fleet(manufacturers=options['manufacturers'], cars=options['cars'],
+                                loans=options['loans'], users=options['users'],
+                                images=options['cars'] if options['images'] is None else options['images'],
+                                distinct_images=options['distinct_images'], batch_size=options['batch_size'],
+                                seed=options['seed'], prefix=prefix, progress=progress)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - started
+        rows = sum(seeded.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {', '.join(f'{count} {name}' for name, count in seeded.items())} "
+            f"in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)."))
@@ -0,0 +1,161 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from django.conf import settings
+from .db_pool import pool_stats
+from .stats import percentile
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Literal lists of different lengths are still the same query shape.
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+VALUES_LIST_RE = re.compile(r'VALUES (?:\((?:%s, )*%s\), )*\((?:%s, )*%s\)')
+
+_current = ContextVar('car_rental_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """SQL recorded for the request running in the current context."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.shapes = Counter()
+
+    def repeated_shapes(self):
+        threshold = settings.PERF_N_PLUS_ONE_THRESHOLD
+        return [(shape, count) for shape, count in self.shapes.items() if count >= threshold]
+
+
+def query_shape(sql):
+    return VALUES_LIST_RE.sub('VALUES (...)', IN_LIST_RE.sub('IN (...)', sql))
+
+
+def record_sql(execute, sql, params, many, context):
+    # Installed on every connection; a no-op outside an instrumented request.
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.sql_seconds += time.perf_counter() - started
+        request_metrics.queries += 1
+        request_metrics.shapes[query_shape(sql)] += 1
+
+
+def install_sql_recorder(connection):
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def start_request():
+    request_metrics = RequestMetrics()
+    return request_metrics, _current.set(request_metrics)
+
+
+def resume_request(request_metrics):
+    # Records SQL for a request again, e.g. while its streaming body is produced.
+    return _current.set(request_metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+class MetricsRegistry:
+    """Per-view latency, query count and SQL time for this process. Samples
+    are kept in a sliding window per view for the percentiles."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def _new_view(self):
+        window = settings.PERF_METRICS_WINDOW
+        return {
+            'requests': 0,
+            'seconds': 0.0,
+            'queries': 0,
+            'sql_seconds': 0.0,
+            'n_plus_one': 0,
+            'latencies': deque(maxlen=window),
+            'query_counts': deque(maxlen=window),
+            'sql_latencies': deque(maxlen=window),
+        }
+
+    def observe(self, view, seconds, request_metrics, n_plus_one):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = self._new_view()
+            stats['requests'] += 1
+            stats['seconds'] += seconds
+            stats['latencies'].append(seconds)
+            if request_metrics is not None:
+                stats['queries'] += request_metrics.queries
+                stats['sql_seconds'] += request_metrics.sql_seconds
+                stats['query_counts'].append(request_metrics.queries)
+                stats['sql_latencies'].append(request_metrics.sql_seconds)
+            stats['n_plus_one'] += n_plus_one
+
+    def snapshot(self):
+        with self._lock:
+            return {view: {key: list(value) if isinstance(value, deque) else value
+                           for key, value in stats.items()}
+                    for view, stats in self._views.items()}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _summary(lines, name, help_text, views, samples_key, sum_key, count_key):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} summary')
+    for view, stats in views:
+        label = escape_label(view)
+        for quantile in QUANTILES:
+            value = percentile(stats[samples_key], quantile)
+            lines.append(f'{name}{{view="{label}",quantile="{quantile}"}} {value:.6g}')
+        lines.append(f'{name}_sum{{view="{label}"}} {stats[sum_key]:.6g}')
+        lines.append(f'{name}_count{{view="{label}"}} {stats[count_key]}')
+
+
+def render_prometheus():
+    views = sorted(registry.snapshot().items())
+    lines = []
+    _summary(lines, 'car_rental_request_duration_seconds', 'Wall time per request by URL name.',
+             views, 'latencies', 'seconds', 'requests')
+    if settings.PERF_RECORD_SQL:
+        _summary(lines, 'car_rental_request_queries', 'SQL queries per request by URL name.',
+                 views, 'query_counts', 'queries', 'requests')
+        _summary(lines, 'car_rental_request_sql_seconds', 'SQL time per request by URL name.',
+                 views, 'sql_latencies', 'sql_seconds', 'requests')
+        lines.append('# HELP car_rental_n_plus_one_total Requests that repeated one SQL shape '
+                     'PERF_N_PLUS_ONE_THRESHOLD or more times.')
+        lines.append('# TYPE car_rental_n_plus_one_total counter')
+        for view, stats in views:
+            lines.append(f'car_rental_n_plus_one_total{{view="{escape_label(view)}"}} {stats["n_plus_one"]}')
+    pools = sorted(pool_stats().items())
+    if pools:
+        for key, kind, help_text in (('in_use', 'gauge', 'Pooled DB connections checked out.'),
+                                     ('idle', 'gauge', 'Pooled DB connections waiting for a request.'),
+                                     ('waiting', 'gauge', 'Requests waiting for a pooled DB connection.'),
+                                     ('opened', 'counter', 'DB connections the pool has opened.')):
+            name = f'car_rental_db_pool_{key}' + ('_total' if kind == 'counter' else '')
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for alias, stats in pools:
+                lines.append(f'{name}{{alias="{escape_label(alias)}"}} {stats[key]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,108 @@
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .metrics import finish_request, registry, resume_request, start_request
+
+logger = logging.getLogger(__name__)
+
+
+class PerformanceMiddleware:
+    """Times each request, counts its SQL when PERF_RECORD_SQL is on, adds a
+    Server-Timing header and feeds the per-view aggregates behind /metrics.
+
+    A streaming response's body is produced after the view returns, so its
+    Server-Timing header only covers the time to the headers; the body is
+    wrapped and the request reaches /metrics, SQL included, once it has been
+    sent (or the client went away)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        request_metrics, token = start_request() if settings.PERF_RECORD_SQL else (None, None)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                finish_request(token)
+        return self.finish(request, response, started, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = start_request() if settings.PERF_RECORD_SQL else (None, None)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                finish_request(token)
+        return self.finish(request, response, started, request_metrics)
+
+    def finish(self, request, response, started, request_metrics):
+        seconds = time.perf_counter() - started
+        timings = [f'app;dur={seconds * 1000:.1f}']
+        if request_metrics is not None:
+            timings.append(f'db;dur={request_metrics.sql_seconds * 1000:.1f};desc="{request_metrics.queries} queries"')
+        response['Server-Timing'] = ', '.join(timings)
+        if not response.streaming:
+            self.record(request, seconds, request_metrics)
+        elif response.is_async:
+            response.streaming_content = self.atimed_stream(request, response.streaming_content, started,
+                                                            request_metrics)
+        else:
+            response.streaming_content = self.timed_stream(request, response.streaming_content, started,
+                                                           request_metrics)
+        return response
+
+    def timed_stream(self, request, content, started, request_metrics):
+        chunks = iter(content)
+        try:
+            while True:
+                token = resume_request(request_metrics) if request_metrics is not None else None
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    if token is not None:
+                        finish_request(token)
+                yield chunk
+        finally:
+            self.record(request, time.perf_counter() - started, request_metrics)
+
+    async def atimed_stream(self, request, content, started, request_metrics):
+        chunks = aiter(content)
+        try:
+            while True:
+                token = resume_request(request_metrics) if request_metrics is not None else None
+                try:
+                    chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    if token is not None:
+                        finish_request(token)
+                yield chunk
+        finally:
+            self.record(request, time.perf_counter() - started, request_metrics)
+
+    def record(self, request, seconds, request_metrics):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else '<unresolved>'
+        n_plus_one = 0
+        if request_metrics is not None:
+            repeated = request_metrics.repeated_shapes()
+            if repeated:
+                n_plus_one = 1
+                for shape, count in repeated:
+                    logger.warning('Possible N+1 in %s (%s %s): %d x %s',
+                                   view, request.method, request.path, count, shape)
+        registry.observe(view, seconds, request_metrics, n_plus_one)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:53
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_rental', '0008_alter_car_id_alter_loan_return_date_carimage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['available', 'price_per_day_usd'], name='cars_available_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['year', 'price_per_day_usd'], name='cars_year_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(django.db.models.functions.text.Lower('transmission'), models.F('price_per_day_usd'), name='cars_transmission_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['car', 'rent_date', 'return_date'], name='loans_car_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['car', 'returned', '-rent_date'], name='loans_car_open_idx'),
+        ),
+    ]
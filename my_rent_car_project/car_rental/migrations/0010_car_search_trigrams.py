@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:54
+
+import re
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of car_rental.search as of this migration, so later changes to
+# the live module cannot change what this migration builds.
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def text_trigrams(text):
+    grams = set()
+    for word in WORD_RE.findall((text or '').lower()):
+        padded = '  ' + word + ' '
+        grams |= {padded[i:i + 3] for i in range(len(padded) - 2)}
+    return grams
+
+
+def car_trigrams(model, manufacturer_name):
+    return text_trigrams(model) | text_trigrams(manufacturer_name)
+
+
+def build_search_index(apps, schema_editor):
+    Car = apps.get_model('car_rental', 'Car')
+    CarSearchTrigram = apps.get_model('car_rental', 'CarSearchTrigram')
+    batch = []
+    for car in Car.objects.select_related('manufacturer').iterator(chunk_size=1000):
+        batch.extend(CarSearchTrigram(car_id=car.id, trigram=gram)
+                     for gram in car_trigrams(car.model, car.manufacturer.name))
+        if len(batch) >= 5000:
+            CarSearchTrigram.objects.bulk_create(batch)
+            batch = []
+    CarSearchTrigram.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_rental', '0009_car_loan_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarSearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_trigrams', to='car_rental.car')),
+            ],
+            options={
+                'db_table': 'car_search_trigrams',
+                'constraints': [models.UniqueConstraint(fields=('trigram', 'car'), name='car_search_trigram_unique')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_rental', '0010_car_search_trigrams'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['user', '-rent_date', '-id'], name='loans_user_history_idx'),
+        ),
+    ]
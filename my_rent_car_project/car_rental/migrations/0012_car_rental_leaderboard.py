@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:05
+
+from decimal import Decimal
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rental_stats(apps, schema_editor):
+    # Frozen copy of the rebuild as of this migration; it only uses the
+    # historical models, so later changes to car_rental.leaderboard do not
+    # change what this migration does.
+    Car = apps.get_model('car_rental', 'Car')
+    Loan = apps.get_model('car_rental', 'Loan')
+    CarRentalDailyStats = apps.get_model('car_rental', 'CarRentalDailyStats')
+    car_loans = Loan.objects.filter(car_id=OuterRef('pk')).order_by().values('car_id')
+    Car.objects.update(
+        rental_count=Coalesce(Subquery(car_loans.annotate(rentals=Count('id')).values('rentals')), 0),
+        revenue_usd=Coalesce(Subquery(car_loans.annotate(revenue=Sum('total_price')).values('revenue')),
+                             Value(Decimal(0)), output_field=models.DecimalField()),
+    )
+    buckets = (Loan.objects.values('car_id', 'rent_date')
+               .annotate(rentals=Count('id'), revenue=Sum('total_price'))
+               .order_by('car_id', 'rent_date'))
+    batch = []
+    for row in buckets.iterator(chunk_size=5000):
+        batch.append(CarRentalDailyStats(car_id=row['car_id'], day=row['rent_date'], rentals=row['rentals'],
+                                         revenue_usd=row['revenue'] or 0))
+        if len(batch) >= 5000:
+            CarRentalDailyStats.objects.bulk_create(batch)
+            batch = []
+    CarRentalDailyStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_rental', '0011_loan_user_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarRentalDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('rentals', models.PositiveIntegerField(default=0)),
+                ('revenue_usd', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'car_rental_daily_stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='rental_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='revenue_usd',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['-rental_count', 'id'], name='cars_rental_count_idx'),
+        ),
+        migrations.AddField(
+            model_name='carrentaldailystats',
+            name='car',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='car_rental.car'),
+        ),
+        migrations.AddIndex(
+            model_name='carrentaldailystats',
+            index=models.Index(fields=['day', 'car'], name='daily_stats_day_car_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='carrentaldailystats',
+            constraint=models.UniqueConstraint(fields=('car', 'day'), name='car_rental_daily_stats_unique'),
+        ),
+        migrations.RunPython(backfill_rental_stats, migrations.RunPython.noop),
+    ]
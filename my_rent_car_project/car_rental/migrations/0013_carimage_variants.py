@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_rental', '0012_car_rental_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:11
+
+import car_rental.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_rental', '0013_carimage_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='carimage',
+            name='image',
+            field=models.ImageField(storage=car_rental.storage.car_image_storage, upload_to='cars/'),
+        ),
+    ]
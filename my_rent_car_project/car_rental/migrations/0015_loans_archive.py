@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_rental', '0014_carimage_content_addressed_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('returned', models.BooleanField(default=True)),
+                ('rent_date', models.DateField()),
+                ('return_date', models.DateField()),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to='car_rental.car')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'loans_archive',
+                'indexes': [models.Index(fields=['user', '-rent_date', '-id'], name='loans_archive_user_idx'), models.Index(fields=['car', 'rent_date'], name='loans_archive_car_idx')],
+            },
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from datetime import date
 from django.utils import timezone
+from django.db.models.functions import Lower
+from .storage import car_image_storage
 
 class Manufacturer(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -12,6 +14,19 @@ class Manufacturer(models.Model):
     class Meta:
         db_table ='manufacturer'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a save that leaves the name alone skips reindexing its cars.
+        instance._loaded_name = dict(zip(field_names, values)).get('name')
+        return instance
+
+    def name_changed(self, update_fields=None):
+        if update_fields is not None:
+            return 'name' in update_fields
+        loaded = getattr(self, '_loaded_name', None)
+        return loaded is None or loaded != self.name
+
     def __str__(self):
         return self.name
 
@@ -23,9 +38,35 @@ class Car(models.Model):
     transmission = models.CharField(max_length=50, null=True, blank=True)
     price_per_day_usd = models.DecimalField(max_digits=8, decimal_places=2, null=False, blank=False)
     available = models.BooleanField(default=True)
+    rental_count = models.PositiveIntegerField(default=0)
+    revenue_usd = models.DecimalField(max_digits=14, decimal_places=2, default=0)
 
     class Meta:
         db_table = 'cars'
+        indexes = [
+            models.Index(fields=['-rental_count', 'id'], name='cars_rental_count_idx'),
+            models.Index(fields=['available', 'price_per_day_usd'], name='cars_available_price_idx'),
+            models.Index(fields=['year', 'price_per_day_usd'], name='cars_year_price_idx'),
+            models.Index(Lower('transmission'), 'price_per_day_usd', name='cars_transmission_lower_idx'),
+        ]
+
+    # Columns the trigram search index is built from (with the manufacturer's name).
+    SEARCH_FIELDS = ('model', 'manufacturer_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a save that leaves the searched text alone skips reindexing.
+        instance._search_values = {name: value for name, value in zip(field_names, values)
+                                   if name in cls.SEARCH_FIELDS}
+        return instance
+
+    def search_fields_changed(self, update_fields=None):
+        if update_fields is not None:
+            return bool({'model', 'manufacturer', 'manufacturer_id'} & set(update_fields))
+        loaded = getattr(self, '_search_values', None)
+        return (loaded is None or len(loaded) < len(self.SEARCH_FIELDS)
+                or any(loaded[name] != getattr(self, name) for name in self.SEARCH_FIELDS))
 
     def __str__(self):
         return f"{self.model} ({self.year})"
@@ -40,15 +81,73 @@ class Loan(models.Model):
 
     class Meta:
         db_table = 'loans'
+        indexes = [
+            models.Index(fields=['car', 'rent_date', 'return_date'], name='loans_car_period_idx'),
+            models.Index(fields=['car', 'returned', '-rent_date'], name='loans_car_open_idx'),
+            models.Index(fields=['user', '-rent_date', '-id'], name='loans_user_history_idx'),
+        ]
 
 
     def __str__(self):
         return f"Loan of {self.car} to {self.user} - Returned: {self.returned}"
 
+class LoanArchive(models.Model):
+    # Closed loans moved out of `loans` by the archive_loans command, under their original ids.
+    id = models.BigIntegerField(primary_key=True)
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='archived_loans')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_loans')
+    returned = models.BooleanField(default=True)
+    rent_date = models.DateField()
+    return_date = models.DateField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        db_table = 'loans_archive'
+        indexes = [
+            models.Index(fields=['user', '-rent_date', '-id'], name='loans_archive_user_idx'),
+            models.Index(fields=['car', 'rent_date'], name='loans_archive_car_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived loan of {self.car} to {self.user}"
+
+class CarRentalDailyStats(models.Model):
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    rentals = models.PositiveIntegerField(default=0)
+    revenue_usd = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'car_rental_daily_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'day'], name='car_rental_daily_stats_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'car'], name='daily_stats_day_car_idx'),
+        ]
+
+    def __str__(self):
+        return f"Car ID {self.car_id} on {self.day}: {self.rentals} rentals"
+
 class CarImage(models.Model):
     car = models.OneToOneField(Car, on_delete=models.CASCADE, related_name='image')
-    image = models.ImageField(upload_to='cars/')
+    image = models.ImageField(upload_to='cars/', storage=car_image_storage)
+    # Resized copies keyed by width, e.g. {"320": {"jpeg": "cars/variants/...", "webp": "..."}}.
+    variants = models.JSONField(default=dict, blank=True)
 
 
     def __str__(self):
-        return f"Image for Car ID {self.car_id}"
\ No newline at end of file
+        return f"Image for Car ID {self.car_id}"
+
+class CarSearchTrigram(models.Model):
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='search_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        db_table = 'car_search_trigrams'
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'car'], name='car_search_trigram_unique'),
+        ]
+
+    def __str__(self):
+        return f"'{self.trigram}' -> Car ID {self.car_id}"
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+class HashingBusy(Exception):
+    """More password hashes are queued than PASSWORD_HASHING_QUEUE allows."""
+
+
+# Tuned hashers: same algorithm names as Django's, so existing hashes verify,
+# with costs read from settings. A hash made with other costs is rewritten
+# on the user's next login.
+
+class TunedPBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class TunedScryptPasswordHasher(hashers.ScryptPasswordHasher):
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+
+class TunedArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+def _get_executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.PASSWORD_HASHING_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_QUEUE)
+    return _executor
+
+
+def run_hashing(func, *args):
+    """Runs a hash on the bounded pool. This limits concurrency, it does not
+    free the request thread: the caller blocks until the hash is done. At most
+    PASSWORD_HASHING_WORKERS hashes run at once per process, whatever the
+    number of request threads; past the queue limit callers get HashingBusy
+    instead of waiting."""
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(raw_password):
+    return run_hashing(hashers.make_password, raw_password)
+
+
+def _check(raw_password, encoded):
+    outdated = []
+    valid = hashers.check_password(raw_password, encoded, setter=outdated.append)
+    return valid, bool(outdated)
+
+
+def verify_password(user, raw_password):
+    """user.check_password() with the hashing on the pool. A valid password
+    stored with an old algorithm or old costs is rehashed and saved."""
+    valid, outdated = run_hashing(_check, raw_password, user.password)
+    if valid and outdated:
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,67 @@
+import re
+from django.db.models import Count
+from .models import Car, CarSearchTrigram
+
+MIN_SIMILARITY = 0.3
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def word_trigrams(word, prefix=False):
+    # Words are padded like pg_trgm ("  ab", "b ") so matches at the start of a
+    # word weigh more. A prefix (still being typed) gets no trailing padding.
+    padded = '  ' + word + ('' if prefix else ' ')
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_trigrams(text, prefix=False):
+    words = WORD_RE.findall((text or '').lower())
+    grams = set()
+    for position, word in enumerate(words):
+        grams |= word_trigrams(word, prefix=prefix and position == len(words) - 1)
+    return grams
+
+
+def car_trigrams(model, manufacturer_name):
+    return text_trigrams(model) | text_trigrams(manufacturer_name)
+
+
+def index_cars(cars):
+    cars = list(cars)
+    CarSearchTrigram.objects.filter(car__in=cars).delete()
+    CarSearchTrigram.objects.bulk_create(
+        [CarSearchTrigram(car_id=car.id, trigram=gram)
+         for car in cars
+         for gram in car_trigrams(car.model, car.manufacturer.name)],
+        batch_size=1000,
+    )
+
+
+def rebuild_index(batch_size=1000):
+    CarSearchTrigram.objects.all().delete()
+    batch = []
+    for car in Car.objects.select_related('manufacturer').only('id', 'model', 'manufacturer__name').iterator(chunk_size=batch_size):
+        batch.append(car)
+        if len(batch) >= batch_size:
+            index_cars(batch)
+            batch = []
+    if batch:
+        index_cars(batch)
+
+
+def search_cars(query, filters=None, limit=20, min_similarity=MIN_SIMILARITY):
+    """Returns (car, score) pairs ranked by the share of query trigrams matched."""
+    grams = text_trigrams(query, prefix=True)
+    if not grams:
+        return []
+
+    ranked = CarSearchTrigram.objects.filter(trigram__in=grams)
+    if filters is not None:
+        ranked = ranked.filter(car__in=Car.objects.filter(filters).values('id'))
+    ranked = (ranked.values('car_id')
+              .annotate(matches=Count('id'))
+              .filter(matches__gte=max(1, round(len(grams) * min_similarity)))
+              .order_by('-matches', 'car_id')[:limit])
+    scores = {row['car_id']: row['matches'] / len(grams) for row in ranked}
+
+    cars = Car.objects.filter(id__in=scores).select_related('manufacturer', 'image')
+    return sorted(((car, scores[car.id]) for car in cars), key=lambda pair: (-pair[1], pair[0].id))
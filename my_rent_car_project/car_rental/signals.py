@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Car, Manufacturer, Loan, CarImage
+from .search import index_cars
+from .availability import availability
+from .catalog_cache import invalidate
+from .images import release_image_files
+from .metrics import install_sql_recorder
+from .auth_backends import forget_user
+
+
+@receiver(post_save, sender=Car)
+def index_saved_car(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Flipping `available` or changing prices leaves the trigrams as they are.
+    if not raw and (created or instance.search_fields_changed(update_fields)):
+        index_cars([instance])
+        instance._search_values = {name: getattr(instance, name) for name in Car.SEARCH_FIELDS}
+
+
+@receiver(post_save, sender=Manufacturer)
+def index_manufacturer_cars(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Only the name is in the cars' trigrams; sales or country changes leave them be.
+    if not raw and not created and instance.name_changed(update_fields):
+        index_cars(instance.cars.select_related('manufacturer'))
+    instance._loaded_name = instance.name
+
+
+@receiver(post_save, sender=Loan)
+def track_new_loan(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(
+            lambda: availability.add(instance.car_id, instance.rent_date, instance.return_date))
+
+
+@receiver(post_delete, sender=Loan)
+def forget_deleted_loan(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: availability.remove(instance.car_id, instance.rent_date, instance.return_date))
+
+
+@receiver(post_delete, sender=Car)
+def forget_deleted_car(sender, instance, **kwargs):
+    availability.remove_car(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Car)
+@receiver([post_save, post_delete], sender=Manufacturer)
+@receiver([post_save, post_delete], sender=CarImage)
+@receiver([post_save, post_delete], sender=Loan)
+def invalidate_catalog_cache(sender, **kwargs):
+    invalidate(sender)
+
+
+@receiver(post_delete, sender=CarImage)
+def release_deleted_image(sender, instance, **kwargs):
+    name, variants = instance.image.name, instance.variants
+    transaction.on_commit(lambda: release_image_files(name, variants))
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_changed_user(sender, instance, raw=False, **kwargs):
+    # Password, is_active and permission changes must reach the cached copy.
+    forget_user(instance.pk)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if settings.PERF_RECORD_SQL:
+        install_sql_recorder(connection)
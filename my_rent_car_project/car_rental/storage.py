@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.[^/]+$')
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ico')
+COMPRESS_MIN_SIZE = 256
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each file under the SHA-256 of its content, e.g.
+    cars/ab/ab12...ef.jfif, so identical uploads share one file and a URL
+    always points at the same bytes."""
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content, so an existing file is the same file.
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        name = '/'.join(part for part in (directory, hexdigest[:2], hexdigest + extension) if part)
+        if self.exists(name):
+            # Mark the shared file as just uploaded, so releasing another image
+            # with the same bytes keeps it for the grace period.
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+def is_content_addressed(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+def car_image_storage():
+    return ContentAddressedStorage(location=settings.MEDIA_ROOT, base_url=settings.MEDIA_URL)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static names from the manifest, plus .gz (and .br when brotli is
+    installed) siblings of text assets so they are never compressed per request."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        compressed = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressed.append(('.br', brotli.compress(data)))
+        for suffix, payload in compressed:
+            # Only worth serving if it actually saves bytes.
+            if len(payload) < len(data):
+                with open(path + suffix, 'wb') as target:
+                    target.write(payload)
+
+    @cached_property
+    def hashed_names(self):
+        return frozenset(self.hashed_files.values())
+
+    def is_hashed(self, name):
+        return name in self.hashed_names
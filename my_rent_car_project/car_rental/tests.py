@@ -1,3 +1,1118 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.http import QueryDict
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from PIL import Image
+from datetime import date, timedelta
+from decimal import Decimal
+from .models import Car, CarImage, CarRentalDailyStats, CarSearchTrigram, Manufacturer, Loan, LoanArchive
+from . import async_views
+from .views import book_car, build_car_filters, flag_is, serialize_car, stream_cars_json
+from .images import generate_variants, image_storage, release_image_files, variant_urls
+from .availability import AvailabilityEngine, IntervalList, availability
+from .benchmarks import seed_fleet
+from .archive import archive_loans
+from .file_serving import parse_range
+from .fleet_export import iter_export
+from .fleet_import import import_fleet, iter_rows
+from .leaderboard import get_leaderboard, rebuild_rental_stats
+from .db_pool import ConnectionPool, PoolTimeout
+from .db_router import PIN_COOKIE
+from . import catalog_cache
+from .catalog_cache import get_cache
+from . import auth_backends, passwords
+from .metrics import registry
+from .search import index_cars, search_cars
+from .storage import CompressedManifestStaticFilesStorage
 
 
+class QueryIndexTests(TestCase):
+
+    def setUp(self):
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.car = Car.objects.create(manufacturer=manufacturer, model='Logan', year=2020,
+                                      transmission='Manual', price_per_day_usd=30)
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Query is not served by {index_name}:\n{plan}")
+
+    def search(self, query_string):
+        return Car.objects.filter(build_car_filters(QueryDict(query_string)))
+
+    def test_search_by_year_uses_index(self):
+        self.assertUsesIndex(self.search('year=2020&min_price=10'), 'cars_year_price_idx')
+
+    def test_search_by_transmission_uses_index(self):
+        self.assertUsesIndex(self.search('transmission=MANUAL'), 'cars_transmission_lower_idx')
+
+    def test_search_by_availability_uses_index(self):
+        self.assertUsesIndex(self.search('available=true&max_price=50'), 'cars_available_price_idx')
+
+    def test_rent_conflict_check_uses_index(self):
+        conflicts = Loan.objects.filter(car=self.car, rent_date__lte=date(2025, 1, 10),
+                                        return_date__gte=date(2025, 1, 1))
+        self.assertUsesIndex(conflicts, 'loans_car_period_idx')
+
+    def test_return_lookup_uses_index(self):
+        open_loans = Loan.objects.filter(flag_is('returned', False), car_id=self.car.id).order_by('-rent_date')
+        self.assertUsesIndex(open_loans, 'loans_car_open_idx')
+
+    def test_transmission_search_is_case_insensitive(self):
+        self.assertEqual(list(self.search('transmission=mAnUaL')), [self.car])
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    workers = 8
+
+    def setUp(self):
+        availability.reset()
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.car = Car.objects.create(manufacturer=manufacturer, model='Logan', year=2020,
+                                      transmission='Manual', price_per_day_usd=30)
+        self.users = [User.objects.create_user(username=f'driver{i}', password='secret-pass')
+                      for i in range(self.workers)]
+
+    def tearDown(self):
+        availability.reset()
+
+    def test_concurrent_requests_never_double_book(self):
+        barrier = threading.Barrier(self.workers, timeout=30)
+        responses = []
+        clients = []
+        for user in self.users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        def book(client, offset):
+            payload = json.dumps({'car_id': self.car.id,
+                                  'start_date': f'2030-01-{1 + offset:02d}',
+                                  'end_date': f'2030-01-{10 + offset:02d}'})
+            try:
+                barrier.wait()
+                responses.append(client.post('/rent_car/', payload, content_type='application/json'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(client, i)) for i, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        booked = [response for response in responses if b'You booked successfully!' in response.content]
+        loans = list(Loan.objects.filter(car=self.car).order_by('rent_date'))
+        self.assertEqual(len(responses), self.workers)
+        self.assertEqual(len(booked), 1)
+        self.assertEqual(len(loans), 1)
+        for earlier, later in zip(loans, loans[1:]):
+            self.assertLess(earlier.return_date, later.rent_date)
+
+
+class AvailabilityEngineTests(TestCase):
+
+    def setUp(self):
+        availability.reset()
+        self.addCleanup(availability.reset)
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.car = Car.objects.create(manufacturer=manufacturer, model='Logan', year=2020,
+                                      transmission='Manual', price_per_day_usd=30)
+        self.today = date.today()
+
+    def book(self, start, end, returned=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Loan.objects.create(car=self.car, user=self.user, returned=returned, rent_date=start,
+                                       return_date=end, total_price=30)
+
+    def test_interval_list_keeps_the_running_max_across_removals(self):
+        intervals = IntervalList()
+        for start, end in ((1, 20), (5, 6), (5, 8), (10, 12)):
+            intervals.add(start, end)
+        self.assertTrue(intervals.overlaps(14, 15))
+        self.assertTrue(intervals.remove(1, 20))
+        self.assertFalse(intervals.overlaps(14, 15))
+        self.assertTrue(intervals.overlaps(7, 9))
+        self.assertFalse(intervals.remove(5, 9))
+        self.assertTrue(intervals.remove(5, 8))
+        self.assertFalse(intervals.overlaps(7, 9))
+        self.assertEqual(len(intervals), 2)
+
+    def test_tracks_booked_and_deleted_loans(self):
+        start, end = self.today + timedelta(days=3), self.today + timedelta(days=5)
+        self.assertFalse(availability.has_conflict(self.car.id, start, end))
+        loan = self.book(start, end)
+        self.assertTrue(availability.has_conflict(self.car.id, end, end + timedelta(days=1)))
+        with self.captureOnCommitCallbacks(execute=True):
+            loan.delete()
+        self.assertFalse(availability.has_conflict(self.car.id, start, end))
+        self.assertIsNone(availability.has_conflict(self.car.id, self.today - timedelta(days=1), end))
+
+    def test_archived_loans_leave_the_index(self):
+        self.book(self.today, self.today, returned=True)
+        self.assertTrue(availability.has_conflict(self.car.id, self.today, self.today))
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_loans(self.today + timedelta(days=1))
+        self.assertFalse(availability.has_conflict(self.car.id, self.today, self.today))
+
+    def test_warm_is_single_flight(self):
+        engine = AvailabilityEngine(ttl=300)
+        calls = []
+
+        def slow_warm():
+            calls.append(1)
+            time.sleep(0.05)
+            engine._intervals, engine._horizon, engine._warmed_at = {}, self.today, time.monotonic()
+
+        with mock.patch.object(engine, 'warm', slow_warm):
+            threads = [threading.Thread(target=engine.has_conflict, args=(self.car.id, self.today, self.today))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+
+
+class BulkRentTests(TestCase):
+
+    def setUp(self):
+        availability.reset()
+        self.addCleanup(availability.reset)
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.cars = [Car.objects.create(manufacturer=manufacturer, model=model, year=2020, transmission='Manual',
+                                        price_per_day_usd=30) for model in ('Logan', 'Sandero', 'Duster')]
+        self.client.force_login(self.user)
+
+    def rent(self, *car_ids):
+        bookings = [{'car_id': car_id, 'start_date': '2030-01-01', 'end_date': '2030-01-02'} for car_id in car_ids]
+        return self.client.post('/api/rent/bulk/', json.dumps({'bookings': bookings}), content_type='application/json')
+
+    def test_books_what_it_can_and_reports_the_rest(self):
+        Loan.objects.create(car=self.cars[1], user=self.user, rent_date=date(2030, 1, 2),
+                            return_date=date(2030, 1, 5), total_price=120)
+        response = self.rent(self.cars[0].id, self.cars[1].id, self.cars[0].id, 999999)
+        messages = [result['message'] for result in response.json()['results']]
+        self.assertEqual(messages, ['You booked successfully!', 'This car is already rented for the selected period.',
+                                    'Car is not available.', 'Car not found.'])
+        self.assertEqual(Loan.objects.filter(car=self.cars[0]).count(), 1)
+        self.assertEqual(Car.objects.get(id=self.cars[0].id).rental_count, 1)
+
+    def test_car_claimed_after_the_check_is_not_double_booked(self):
+        Car.objects.filter(id=self.cars[1].id).update(available=False)
+        in_bulk = QuerySet.in_bulk
+
+        def stale_in_bulk(queryset, *args, **kwargs):
+            cars = in_bulk(queryset, *args, **kwargs)
+            for car in cars.values():
+                car.available = True
+            return cars
+
+        with mock.patch.object(QuerySet, 'in_bulk', stale_in_bulk):
+            response = self.rent(self.cars[0].id, self.cars[1].id, self.cars[2].id)
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, ['success', 'error', 'success'])
+        self.assertEqual(sorted(Loan.objects.values_list('car_id', flat=True)), [self.cars[0].id, self.cars[2].id])
+        self.assertEqual(Car.objects.get(id=self.cars[1].id).rental_count, 0)
+
+    def test_database_error_rolls_the_batch_back(self):
+        with mock.patch.object(Loan.objects, 'bulk_create', side_effect=DatabaseError):
+            response = self.rent(self.cars[0].id, self.cars[1].id)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertTrue(all(car.available and not car.rental_count for car in Car.objects.all()))
+
+
+class CarListQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='driver', password='secret-pass'))
+        self.makers = [Manufacturer.objects.create(name=f'Maker {i}', founded_date=date(1966, 1, 1), global_sales=1.0)
+                       for i in range(3)]
+
+    def add_cars(self, count):
+        start = Car.objects.count()
+        Car.objects.bulk_create([Car(manufacturer=self.makers[i % 3], model=f'Model {i}', year=2020,
+                                     transmission='Manual', price_per_day_usd=20 + i)
+                                 for i in range(start, start + count)])
+
+    def list_queries(self, query):
+        # A cache hit would skip the query being measured.
+        get_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/cars/?{query}')
+        self.assertEqual(len(response.context['cars']), 5)
+        self.assertEqual(sum('FROM "cars"' in query['sql'] for query in queries.captured_queries), 1)
+        return len(queries), response
+
+    def test_query_count_does_not_grow_with_the_fleet(self):
+        self.add_cars(20)
+        # The first request also caches the logged-in user.
+        self.client.get('/cars/')
+        first_page, response = self.list_queries('transmission=manual&min_price=21&sort=-price&page_size=5')
+        next_query = response.context['next_query']
+        next_page, _ = self.list_queries(next_query)
+
+        self.add_cars(20)
+        with self.assertNumQueries(first_page):
+            self.list_queries('transmission=manual&min_price=21&sort=-price&page_size=5')
+        with self.assertNumQueries(next_page):
+            self.list_queries(next_query)
+
+
+class MyRentalsQueryCountTests(TestCase):
+
+    def setUp(self):
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        self.client.force_login(self.user)
+        self.cars = [Car.objects.create(manufacturer=manufacturer, model=f'Logan {i}', year=2020,
+                                        transmission='Manual', price_per_day_usd=30) for i in range(5)]
+        # Puts the user in the auth cache.
+        self.client.get('/my-rentals/')
+
+    def add_loans(self, count):
+        Loan.objects.bulk_create([
+            Loan(car=self.cars[i % len(self.cars)], user=self.user, returned=True,
+                 rent_date=date(2024, 1, 1 + i % 28), return_date=date(2024, 2, 1), total_price=30)
+            for i in range(count)
+        ])
+
+    def assertPageQueries(self, query_string='', queries=2):
+        # Session and a single joined page of loans; the user comes from the cache.
+        with self.assertNumQueries(queries):
+            response = self.client.get('/my-rentals/' + query_string)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.add_loans(1)
+        self.assertPageQueries()
+        self.add_loans(120)
+        response = self.assertPageQueries()
+        self.assertEqual(len(response.context['rentals']), 50)
+        self.assertPageQueries('?' + response.context['next_query'])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_leave_only_the_page_query(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.client.get('/my-rentals/')
+        self.add_loans(10)
+        self.assertPageQueries(queries=1)
+
+    def test_pages_cover_history_once(self):
+        self.add_loans(30)
+        seen = []
+        query = 'page_size=7&from=2024-01-05'
+        while query:
+            response = self.assertPageQueries('?' + query)
+            seen.extend(rental.id for rental in response.context['rentals'])
+            query = response.context['next_query']
+        expected = Loan.objects.filter(user=self.user, rent_date__gte=date(2024, 1, 5))
+        self.assertEqual(sorted(seen), sorted(expected.values_list('id', flat=True)))
+
+
+class CachedUserTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        self.other_session = Client()
+        self.other_session.force_login(self.user)
+        self.client.force_login(self.user)
+        self.assertEqual(self.other_session.get('/my-rentals/').status_code, 200)
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.client.post('/reset-passwords/', {'old_password': 'secret-pass', 'new_password': 'other-pass-42'})
+        self.assertTrue(User.objects.get(id=self.user.id).check_password('other-pass-42'))
+        response = self.other_session.get('/my-rentals/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_change_keeps_concurrent_admin_changes(self):
+        # A direct update sends no signal, so the session's cached user is now stale.
+        User.objects.filter(id=self.user.id).update(email='new@example.com', is_staff=True)
+        self.client.post('/reset-passwords/', {'old_password': 'secret-pass', 'new_password': 'other-pass-42'})
+        user = User.objects.get(id=self.user.id)
+        self.assertTrue(user.check_password('other-pass-42'))
+        self.assertEqual((user.email, user.is_staff), ('new@example.com', True))
+
+    def test_login_looks_the_user_up_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().post('/login/', {'username': 'driver', 'password': 'secret-pass'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        user_selects = [query['sql'] for query in queries.captured_queries
+                        if query['sql'].startswith('SELECT') and 'FROM "auth_user"' in query['sql']]
+        self.assertEqual(len(user_selects), 1)
+
+
+class SeedFleetTests(TestCase):
+
+    def test_seeded_loan_histories_do_not_overlap(self):
+        seeded = seed_fleet(manufacturers=3, cars=10, loans=503, users=5, batch_size=100)
+        self.assertEqual(seeded, {'manufacturers': 3, 'cars': 10, 'users': 5, 'loans': 503, 'images': 0})
+        previous = None
+        for loan in Loan.objects.order_by('car_id', 'rent_date'):
+            self.assertLessEqual(loan.rent_date, loan.return_date)
+            self.assertLess(loan.return_date, date.today())
+            if previous is not None and previous.car_id == loan.car_id:
+                self.assertLess(previous.return_date, loan.rent_date)
+            previous = loan
+        self.assertEqual(sum(Car.objects.values_list('rental_count', flat=True)), 503)
+
+    def test_existing_rows_are_left_alone(self):
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        car = Car.objects.create(manufacturer=manufacturer, model='Logan', year=2020, transmission='Manual',
+                                 price_per_day_usd=30, rental_count=4)
+        CarRentalDailyStats.objects.create(car=car, day=date.today(), rentals=4, revenue_usd=120)
+        grams = sorted(CarSearchTrigram.objects.filter(car=car).values_list('trigram', flat=True))
+
+        seed_fleet(manufacturers=2, cars=5, loans=20, users=2, batch_size=2)
+        car.refresh_from_db()
+        self.assertEqual(car.rental_count, 4)
+        self.assertEqual(CarRentalDailyStats.objects.get(car=car).rentals, 4)
+        self.assertEqual(sorted(CarSearchTrigram.objects.filter(car=car).values_list('trigram', flat=True)), grams)
+        seeded = Car.objects.filter(model__startswith='Bench Car ')
+        self.assertEqual(sum(seeded.values_list('rental_count', flat=True)), 20)
+        self.assertEqual(CarSearchTrigram.objects.filter(car__in=seeded).values('car').distinct().count(), 5)
+
+
+class ArchiveLoansTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.car = Car.objects.create(manufacturer=manufacturer, model='Logan', year=2020,
+                                      transmission='Manual', price_per_day_usd=30)
+        for year, returned in ((2019, True), (2020, True), (2021, True), (2021, False)):
+            Loan.objects.create(car=self.car, user=self.user, returned=returned, rent_date=date(year, 3, 1),
+                                return_date=date(year, 3, 5), total_price=150)
+        self.client.force_login(self.user)
+
+    def test_moves_closed_loans_before_the_cutoff(self):
+        self.assertEqual(archive_loans(date(2021, 1, 1), batch_size=1), 2)
+        self.assertEqual(sorted(LoanArchive.objects.values_list('rent_date__year', flat=True)), [2019, 2020])
+        self.assertEqual(Loan.objects.count(), 2)
+
+        rebuild_rental_stats()
+        self.car.refresh_from_db()
+        self.assertEqual(self.car.rental_count, 4)
+
+    def test_history_includes_archived_loans_when_asked(self):
+        archive_loans(date(2021, 1, 1))
+        response = self.client.get('/my-rentals/?page_size=2')
+        self.assertEqual([loan.rent_date.year for loan in response.context['rentals']], [2021, 2021])
+        self.assertIsNone(response.context['next_query'])
+
+        response = self.client.get('/my-rentals/?archived=1&page_size=3')
+        self.assertEqual([loan.rent_date.year for loan in response.context['rentals']], [2021, 2021, 2020])
+        response = self.client.get(f"/my-rentals/?{response.context['next_query']}")
+        self.assertEqual([loan.rent_date.year for loan in response.context['rentals']], [2019])
+        self.assertIsNone(response.context['next_query'])
+
+
+class ConnectionPoolTests(TestCase):
+
+    def make_pool(self, **options):
+        options = {'max_size': 2, 'timeout': 0.05, 'max_lifetime': 60, 'max_idle': 60, 'check': True, **options}
+        pool = ConnectionPool(lambda: sqlite3.connect(':memory:', check_same_thread=False), **options)
+        self.addCleanup(pool.close_all)
+        return pool
+
+    def test_reuses_connections_and_caps_the_pool(self):
+        pool = self.make_pool()
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['opened'], 2)
+
+    def test_replaces_broken_and_expired_connections(self):
+        pool = self.make_pool()
+        broken = pool.acquire()
+        pool.release(broken)
+        broken.close()
+        self.assertIsNot(pool.acquire(), broken)
+
+        pool = self.make_pool(max_lifetime=0)
+        old = pool.acquire()
+        pool.release(old)
+        self.assertIsNot(pool.acquire(), old)
+        self.assertEqual(pool.stats()['size'], 1)
+
+
+REPLICA = settings.DATABASE_REPLICA_ALIAS
+SEPARATE_REPLICA = (REPLICA in settings.DATABASES
+                    and not settings.DATABASES[REPLICA].get('TEST', {}).get('MIRROR'))
+
+
+@skipUnless(SEPARATE_REPLICA, 'needs a separate replica database, see my_rent_car_project/test_settings.py')
+class ReplicaRoutingTests(TransactionTestCase):
+    # TestCase's wrapping transaction would keep every read on the primary.
+    databases = {'default', REPLICA} if SEPARATE_REPLICA else {'default'}
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='driver', password='secret-pass'))
+        self.primary_maker = Manufacturer.objects.create(name='Primary', founded_date=date(1966, 1, 1),
+                                                         global_sales=1.0)
+        Manufacturer.objects.using(REPLICA).create(name='Replica', founded_date=date(1966, 1, 1), global_sales=1.0)
+
+    def manufacturer_names(self):
+        get_cache().clear()
+        response = self.client.get('/manufacturers/')
+        return [maker.name for maker in response.context['manufacturers']]
+
+    def test_catalog_reads_use_the_replica_once_it_caught_up(self):
+        self.assertEqual(self.manufacturer_names(), ['Primary'])
+        with override_settings(DATABASE_REPLICA_LAG=0):
+            self.assertEqual(self.manufacturer_names(), ['Replica'])
+
+    def test_streamed_search_reads_the_replica(self):
+        replica_maker = Manufacturer.objects.using(REPLICA).get(name='Replica')
+        # bulk_create skips the post_save indexing, which writes to the primary.
+        Car.objects.using(REPLICA).bulk_create([Car(manufacturer=replica_maker, model='Replica car', year=2020,
+                                                    transmission='Manual', price_per_day_usd=30)])
+        get_cache().clear()
+        with override_settings(DATABASE_REPLICA_LAG=0):
+            response = self.client.get('/cars/search/?stream=1')
+            # The body is produced after the view returned, outside read_from_replica.
+            cars = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([car['model'] for car in cars], ['Replica car'])
+
+    def test_booking_client_reads_its_writes_from_the_primary(self):
+        car = Car.objects.create(manufacturer=self.primary_maker, model='Logan', year=2020,
+                                 transmission='Manual', price_per_day_usd=30)
+        payload = json.dumps({'car_id': car.id, 'start_date': '2030-01-01', 'end_date': '2030-01-05'})
+        with override_settings(DATABASE_REPLICA_LAG=30):
+            response = self.client.post('/rent_car/', payload, content_type='application/json')
+        self.assertContains(response, 'You booked successfully!')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 30)
+        self.assertTrue(Loan.objects.filter(car=car).exists())
+        self.assertFalse(Loan.objects.using(REPLICA).exists())
+        with override_settings(DATABASE_REPLICA_LAG=0):
+            self.assertEqual(self.manufacturer_names(), ['Primary'])
+
+
+class SearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.dacia = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.logan = Car.objects.create(manufacturer=self.dacia, model='Logan', year=2020,
+                                        transmission='Manual', price_per_day_usd=30)
+        self.duster = Car.objects.create(manufacturer=self.dacia, model='Duster', year=2021,
+                                         transmission='Manual', price_per_day_usd=40)
+
+    def found(self, query):
+        return [car.model for car, _ in search_cars(query)]
+
+    def test_ranks_typos_and_prefixes(self):
+        self.assertEqual(self.found('logn')[0], 'Logan')
+        self.assertEqual(self.found('dus')[0], 'Duster')
+        self.assertEqual(self.found('dacia'), ['Logan', 'Duster'])
+        self.assertEqual(self.found('zzz'), [])
+
+    def test_renamed_car_is_reindexed(self):
+        self.logan.model = 'Sandero'
+        self.logan.save()
+        self.assertEqual(self.found('sandero'), ['Sandero'])
+        self.assertNotIn('Sandero', self.found('logan'))
+
+    def test_availability_flips_do_not_reindex(self):
+        car = Car.objects.get(id=self.logan.id)
+        with CaptureQueriesContext(connection) as queries:
+            car.available = False
+            car.save()
+            car.save(update_fields=['available'])
+        self.assertFalse(any('car_search_trigrams' in query['sql'] for query in queries.captured_queries))
+
+    def test_manufacturer_reindexes_its_cars_only_on_rename(self):
+        maker = Manufacturer.objects.get(id=self.dacia.id)
+        with CaptureQueriesContext(connection) as queries:
+            maker.global_sales = 2.5
+            maker.country = 'Romania'
+            maker.save()
+            maker.save(update_fields=['global_sales'])
+        self.assertFalse(any('car_search_trigrams' in query['sql'] for query in queries.captured_queries))
+
+        maker.name = 'Renault'
+        maker.save()
+        self.assertEqual(self.found('renault'), ['Logan', 'Duster'])
+
+    def test_index_cars_replaces_a_cars_trigrams(self):
+        CarSearchTrigram.objects.filter(car=self.logan).delete()
+        CarSearchTrigram.objects.create(car=self.logan, trigram='xxx')
+        index_cars(Car.objects.filter(id=self.logan.id).select_related('manufacturer'))
+        self.assertFalse(CarSearchTrigram.objects.filter(trigram='xxx').exists())
+        self.assertEqual(self.found('logan'), ['Logan'])
+
+    def test_return_does_not_touch_the_index(self):
+        user = User.objects.create_user(username='driver', password='secret-pass')
+        Loan.objects.create(car=self.logan, user=user, rent_date=date(2030, 1, 1), return_date=date(2030, 1, 5))
+        Car.objects.filter(id=self.logan.id).update(available=False)
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/return_car/', json.dumps({'car_id': self.logan.id}),
+                                        content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertTrue(Car.objects.get(id=self.logan.id).available)
+        self.assertFalse(any('car_search_trigrams' in query['sql'] for query in queries.captured_queries))
+
+
+class CatalogConditionalTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.car = Car.objects.create(manufacturer=manufacturer, model='Logan', year=2020,
+                                      transmission='Manual', price_per_day_usd=30)
+        self.client.force_login(self.user)
+
+    def revalidate(self, path):
+        etag = self.client.get(path)['ETag']
+        return etag, self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_catalog_answers_304(self):
+        etag, response = self.revalidate('/cars/')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get('/cars/')['ETag']
+        self.car.available = False
+        self.car.save()
+        response = self.client.get('/cars/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_versions_expire_without_writes(self):
+        # Another worker's write never reaches this cache; the epoch expiring
+        # is what bounds how long the old ETag is honoured.
+        get_cache().clear()
+        with self.settings(CATALOG_CACHE_TIMEOUT=1):
+            etag, response = self.revalidate('/cars/')
+            self.assertEqual(response.status_code, 304)
+            time.sleep(1.1)
+            self.assertEqual(self.client.get('/cars/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_top_cars_etag_changes_at_midnight(self):
+        today = date.today()
+
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return today + timedelta(days=1)
+
+        etag, response = self.revalidate('/top-cars/?days=7')
+        self.assertEqual(response.status_code, 304)
+        with mock.patch.object(catalog_cache, 'date', Tomorrow):
+            response = self.client.get('/top-cars/?days=7', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class FleetImportTests(TestCase):
+
+    def setUp(self):
+        Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+
+    def import_csv(self, text, kind='cars'):
+        return import_fleet(iter_rows(io.StringIO(text), 'csv'), kind=kind)
+
+    def test_imports_good_rows_and_reports_bad_ones_by_row(self):
+        report = self.import_csv(
+            'manufacturer_name,model,year,transmission,price_per_day_usd\n'
+            'Dacia,Logan,2020,Manual,30.50\n'
+            'Dacia,Sandero,2021,Manual,123456789\n'
+            'Dacia,Duster,2022,Manual,NaN\n'
+            'Dacia,Jogger,2022,Manual,Infinity\n'
+            'Dacia,Spring,2023,Manual,19.999\n'
+            f'Dacia,{"x" * 256},2023,Manual,20\n'
+            'Dacia,"Multi\nline",2024,Manual,abc\n'
+            'Renault,Clio,2020,Manual,25\n'
+        )
+        self.assertEqual((report['processed'], report['created'], report['failed']), (8, 1, 7))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4, 5, 6, 7, 9, 10])
+        self.assertTrue(report['errors'][0]['message'].startswith('price_per_day_usd:'))
+        self.assertTrue(report['errors'][4]['message'].startswith('model:'))
+        self.assertEqual(list(Car.objects.values_list('model', 'price_per_day_usd')), [('Logan', Decimal('30.50'))])
+
+    def test_manufacturer_rows_are_validated(self):
+        report = self.import_csv(
+            'name,country,founded_date,global_sales\n'
+            'Skoda,Czechia,1895-12-18,1.2\n'
+            f'Lada,{"x" * 101},1966-07-20,0.3\n'
+            'Tata,India,1945-09-01,inf\n'
+            'Dacia,Romania,1966-01-01,1\n',
+            kind='manufacturers',
+        )
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([(error['row'], error['message'].split(':')[0]) for error in report['errors']],
+                         [(2, 'country'), (3, 'global_sales must be a number.'),
+                          (4, "A manufacturer named 'Dacia' already exists.")])
+
+
+class StreamingExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_fleet(manufacturers=2, cars=7, loans=0, users=1, batch_size=100)
+        cls.admin = User.objects.create_superuser(username='admin', password='secret-pass')
+
+    def test_export_chunks_match_a_single_read(self):
+        header = 'id,manufacturer_id,manufacturer_name,model,year,transmission,price_per_day_usd,available\r\n'
+        rows = Car.objects.order_by('id').values_list('id', 'manufacturer_id', 'manufacturer__name', 'model',
+                                                      'year', 'transmission', 'price_per_day_usd', 'available')
+        expected = header + ''.join(','.join('' if value is None else str(value) for value in row) + '\r\n'
+                                    for row in rows)
+        for chunk_size in (1, 3, 7, 100):
+            self.assertEqual(''.join(iter_export('cars', 'csv', chunk_size=chunk_size)), expected)
+
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/export/cars/?format=jsonl')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['id'] for line in lines], [row[0] for row in rows])
+
+    def test_command_writes_to_its_stdout(self):
+        output = io.StringIO()
+        call_command('export_rentals', 'cars', format='jsonl', chunk_size=3, stdout=output)
+        self.assertEqual(output.getvalue(), ''.join(iter_export('cars', 'jsonl')))
+        self.assertEqual(len(output.getvalue().splitlines()), 7)
+
+    def test_streamed_search_matches_the_full_result(self):
+        cars = Car.objects.select_related('manufacturer', 'image').order_by('id')
+        expected = [serialize_car(car) for car in cars]
+        for chunk_size in (1, 3, 7, 100):
+            self.assertEqual(json.loads(''.join(stream_cars_json(cars, chunk_size=chunk_size))), expected)
+        self.assertEqual(json.loads(''.join(stream_cars_json(cars.none()))), [])
+
+        self.client.force_login(self.admin)
+        response = self.client.get('/cars/search/?stream=1')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+
+
+class PerformanceMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_fleet(manufacturers=2, cars=5, loans=0, users=1, batch_size=100)
+        cls.admin = User.objects.create_superuser(username='admin', password='secret-pass')
+
+    def setUp(self):
+        get_cache().clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.client.force_login(self.admin)
+
+    def test_records_each_request_per_view(self):
+        response = self.client.get('/cars/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+        stats = registry.snapshot()['get_all_cars']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries'], 0)
+
+    def test_streaming_body_is_recorded_once_sent(self):
+        response = self.client.get('/cars/search/?stream=1')
+        self.assertIn('Server-Timing', response)
+        self.assertNotIn('search_car', registry.snapshot())
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 5)
+        stats = registry.snapshot()['search_car']
+        self.assertEqual(stats['requests'], 1)
+        # The chunk queries run while the body is sent and still count.
+        self.assertGreaterEqual(stats['queries'], 1)
+
+    def test_metrics_renders_prometheus_summaries(self):
+        self.client.get('/cars/')
+        self.client.get('/cars/')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('# TYPE car_rental_request_duration_seconds summary', body)
+        self.assertRegex(body, r'car_rental_request_duration_seconds\{view="get_all_cars",quantile="0.99"\} [\d.e-]+')
+        self.assertIn('car_rental_request_duration_seconds_count{view="get_all_cars"} 2', body)
+        self.assertIn('car_rental_request_queries_count{view="get_all_cars"} 2', body)
+        self.assertIn('car_rental_n_plus_one_total{view="get_all_cars"} 0', body)
+
+
+class AsyncRentCarTests(TestCase):
+
+    def setUp(self):
+        availability.reset()
+        self.addCleanup(availability.reset)
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.cars = [Car.objects.create(manufacturer=manufacturer, model=model, year=2020, transmission='Manual',
+                                        price_per_day_usd=30) for model in ('Logan', 'Sandero')]
+        self.client.force_login(self.user)
+
+    async def rent(self, url, car, start='2030-01-01', end='2030-01-03'):
+        await self.async_client.aforce_login(self.user)
+        payload = json.dumps({'car_id': car.id, 'start_date': start, 'end_date': end})
+        return await self.async_client.post(url, payload, content_type='application/json')
+
+    async def test_answers_like_the_sync_view(self):
+        for car, url in zip(self.cars, ('/rent_car/', '/api/async/rent_car/')):
+            booked = await self.rent(url, car)
+            self.assertTemplateUsed(booked, 'car_rental/rent_car.html')
+            self.assertEqual((booked.context['message'], booked.context['total_price']),
+                             ('You booked successfully!', Decimal('90.00')))
+            rejected = await self.rent(url, car, end='2029-12-31')
+            self.assertEqual(rejected.context['error'], 'Start date must be before end date.')
+
+    async def test_return_answers_like_the_sync_view(self):
+        await self.async_client.aforce_login(self.user)
+        for car, url in zip(self.cars, ('/return_car/', '/api/async/return_car/')):
+            self.assertTemplateUsed(await self.async_client.get(url), 'car_rental/return_car.html')
+            await self.rent(url.replace('return', 'rent'), car)
+            response = await self.async_client.post(url, json.dumps({'car_id': car.id}),
+                                                    content_type='application/json')
+            self.assertEqual(response.json(), {'status': 'success', 'message': 'Car returned successfully.'})
+
+    async def test_failed_return_leaves_the_car_rented(self):
+        await self.rent('/api/async/rent_car/', self.cars[0])
+        with mock.patch.object(Loan, 'save', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            await self.async_client.post('/api/async/return_car/', json.dumps({'car_id': self.cars[0].id}),
+                                         content_type='application/json')
+        self.assertFalse((await Car.objects.aget(id=self.cars[0].id)).available)
+
+    async def test_database_error_asks_to_retry(self):
+        with mock.patch.object(async_views, 'book_car', side_effect=DatabaseError):
+            response = await self.rent('/api/async/rent_car/', self.cars[0])
+        self.assertEqual(response.context['error'], 'The car could not be booked right now, please try again.')
+
+
+class CarImageFilesTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.storage = image_storage()
+        for attribute in ('base_location', 'location'):
+            patcher = mock.patch.object(self.storage, attribute, media_root)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.cars = [Car.objects.create(manufacturer=manufacturer, model=model, year=2020, transmission='Manual',
+                                        price_per_day_usd=30) for model in ('Logan', 'Sandero')]
+
+    def upload(self, car, content=b'same bytes'):
+        return CarImage.objects.create(car=car, image=ContentFile(content, name='photo.jpg'))
+
+    def age(self, name, seconds=2 * 3600):
+        past = time.time() - seconds
+        os.utime(self.storage.path(name), (past, past))
+
+    def delete(self, car_image):
+        with self.captureOnCommitCallbacks(execute=True):
+            car_image.delete()
+
+    def test_identical_uploads_share_a_file_until_the_last_is_deleted(self):
+        first, second = self.upload(self.cars[0]), self.upload(self.cars[1])
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('cars/'))
+        self.age(first.image.name)
+
+        self.delete(first)
+        self.assertTrue(self.storage.exists(second.image.name))
+        self.delete(second)
+        self.assertFalse(self.storage.exists(second.image.name))
+
+    def test_release_keeps_a_file_an_upload_just_saved(self):
+        first = self.upload(self.cars[0])
+        self.age(first.image.name)
+        # A concurrent upload of the same bytes has saved its file but not yet its row.
+        name = self.storage.save('cars/photo.jpg', ContentFile(b'same bytes'))
+        self.assertEqual(name, first.image.name)
+
+        self.delete(first)
+        self.assertTrue(self.storage.exists(name))
+        self.upload(self.cars[1])
+        release_image_files(name, {})
+        self.assertTrue(self.storage.exists(name))
+
+    def upload_picture(self, car, width, height):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (width, height), (200, 30, 30, 255)).save(buffer, 'PNG')
+        car_image = self.upload(car, buffer.getvalue())
+        generate_variants(car_image.id)
+        car_image.refresh_from_db()
+        return car_image
+
+    @override_settings(CAR_IMAGE_VARIANT_WIDTHS=(320, 640, 1280))
+    def test_variants_cover_each_width_below_the_original(self):
+        car_image = self.upload_picture(self.cars[0], 800, 400)
+        self.assertEqual(sorted(car_image.variants, key=int), ['320', '640'])
+        for width, formats in car_image.variants.items():
+            self.assertEqual(sorted(formats), ['jpeg', 'webp'])
+            for key, name in formats.items():
+                with self.storage.open(name) as variant_file:
+                    variant = Image.open(variant_file)
+                    self.assertEqual((variant.format, variant.size),
+                                     ('JPEG' if key == 'jpeg' else 'WEBP', (int(width), int(width) // 2)))
+
+        thumbnail_url, srcset, webp_srcset = variant_urls(car_image)
+        self.assertEqual(thumbnail_url, self.storage.url(car_image.variants['320']['jpeg']))
+        self.assertEqual(srcset.split(', ')[1], f"{self.storage.url(car_image.variants['640']['jpeg'])} 640w")
+        self.assertTrue(webp_srcset.endswith('.webp 640w'))
+
+    def test_small_image_gets_one_variant_at_its_own_width(self):
+        car_image = self.upload_picture(self.cars[0], 200, 100)
+        self.assertEqual(list(car_image.variants), ['200'])
+
+    def test_released_image_takes_its_variants_along(self):
+        car_image = self.upload_picture(self.cars[0], 800, 400)
+        names = [car_image.image.name] + [name for formats in car_image.variants.values()
+                                          for name in formats.values()]
+        self.age(car_image.image.name)
+        self.delete(car_image)
+        self.assertFalse(any(self.storage.exists(name) for name in names))
+        self.assertEqual(variant_urls(CarImage(variants={})), ('', '', ''))
+
+
+class PasswordHashingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+
+    def store(self, encoded):
+        User.objects.filter(id=self.user.id).update(password=encoded)
+
+    def log_in(self, username='driver', password='secret-pass'):
+        return Client().post('/login/', {'username': username, 'password': password})
+
+    def test_login_rehashes_an_outdated_hash(self):
+        self.store(make_password('secret-pass', hasher='scrypt'))
+        self.assertRedirects(self.log_in(), '/', fetch_redirect_response=False)
+        self.assertTrue(User.objects.get(id=self.user.id).password.startswith('pbkdf2_sha256$'))
+
+        # PASSWORD_HASHING=scrypt moves PBKDF2 hashes over.
+        with override_settings(PASSWORD_HASHERS=['car_rental.passwords.TunedScryptPasswordHasher',
+                                                 'car_rental.passwords.TunedPBKDF2PasswordHasher']):
+            self.assertRedirects(self.log_in(), '/', fetch_redirect_response=False)
+            self.assertTrue(User.objects.get(id=self.user.id).password.startswith('scrypt$'))
+
+        # Same algorithm, fewer iterations than PASSWORD_PBKDF2_ITERATIONS.
+        self.store(PBKDF2PasswordHasher().encode('secret-pass', 'saltsaltsalt', iterations=1000))
+        with override_settings(PASSWORD_HASHERS=['car_rental.passwords.TunedPBKDF2PasswordHasher'],
+                               PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertRedirects(self.log_in(), '/', fetch_redirect_response=False)
+            self.assertTrue(User.objects.get(id=self.user.id).password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_wrong_password_keeps_the_hash(self):
+        encoded = make_password('secret-pass', hasher='pbkdf2_sha256')
+        self.store(encoded)
+        self.assertContains(self.log_in(password='wrong-pass'), 'Incorrect username or password.')
+        self.assertEqual(User.objects.get(id=self.user.id).password, encoded)
+
+    def test_unknown_username_still_hashes(self):
+        with mock.patch.object(auth_backends, 'hash_password', wraps=passwords.hash_password) as hashed:
+            response = self.log_in(username='nobody')
+        self.assertContains(response, 'Incorrect username or password.')
+        hashed.assert_called_once_with('secret-pass')
+
+    def test_login_answers_503_when_the_hashing_queue_is_full(self):
+        passwords._get_executor()
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with mock.patch.object(passwords, '_slots', slots):
+            response = self.log_in()
+        self.assertContains(response, 'Too many sign-ins right now, please try again.', status_code=503)
+        self.assertRedirects(self.log_in(), '/', fetch_redirect_response=False)
+
+
+class StaticFilesTests(TestCase):
+    stylesheet = 'body { color: #222; }\n' * 40
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        for name, content in (('css/site.css', self.stylesheet), ('css/tiny.css', 'a{}')):
+            os.makedirs(os.path.join(self.static_root, 'css'), exist_ok=True)
+            with open(os.path.join(self.static_root, name), 'w') as source:
+                source.write(content)
+        self.settings_override = override_settings(STATIC_ROOT=self.static_root, STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'car_rental.storage.CompressedManifestStaticFilesStorage'},
+        })
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def collect(self):
+        storage = CompressedManifestStaticFilesStorage(location=self.static_root)
+        paths = {name: (storage, name) for name in ('css/site.css', 'css/tiny.css')}
+        list(storage.post_process(paths))
+        return storage
+
+    def test_collect_writes_hashed_names_and_compressed_copies(self):
+        storage = self.collect()
+        hashed = storage.stored_name('css/site.css')
+        self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(storage.is_hashed(hashed))
+        self.assertFalse(storage.is_hashed('css/site.css'))
+        with gzip.open(storage.path(hashed) + '.gz', 'rt') as compressed:
+            self.assertEqual(compressed.read(), self.stylesheet)
+        # Too small to be worth compressing.
+        self.assertFalse(os.path.exists(storage.path(storage.stored_name('css/tiny.css')) + '.gz'))
+
+    def test_serves_the_precompressed_copy_with_a_long_cache_lifetime(self):
+        hashed = self.collect().stored_name('css/site.css')
+        response = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)).decode(), self.stylesheet)
+
+        response = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content).decode(), self.stylesheet)
+
+    def test_compressed_copies_are_not_served_directly(self):
+        hashed = self.collect().stored_name('css/site.css')
+        response = self.client.get(f'/static/{hashed}.gz', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unhashed_names_are_revalidated(self):
+        self.collect()
+        response = self.client.get('/static/css/site.css')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        response = self.client.get('/static/css/site.css', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class MediaServingTests(TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, 'docs'))
+        with open(os.path.join(self.media_root, 'docs', 'terms of use.pdf'), 'wb') as target:
+            target.write(self.content)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_OFFLOAD='')
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def get(self, **headers):
+        return self.client.get('/media/docs/terms of use.pdf', **headers)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        self.assertIsNone(parse_range('items=0-1', 1000))
+        self.assertIsNone(parse_range('bytes=-', 1000))
+        self.assertIs(parse_range('bytes=-0', 1000), False)
+        self.assertIs(parse_range('bytes=1000-', 1000), False)
+        self.assertIs(parse_range('bytes=5-2', 1000), False)
+
+    def test_serves_single_and_suffix_ranges(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.get(HTTP_RANGE='bytes=-24')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-24:])
+
+    def test_multi_range_and_stale_if_range_get_the_whole_file(self):
+        for headers in ({'HTTP_RANGE': 'bytes=0-1,5-6'}, {'HTTP_RANGE': 'bytes=0-1', 'HTTP_IF_RANGE': '"stale"'}):
+            response = self.get(**headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Accept-Ranges'], 'bytes')
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_unsatisfiable_range_is_416(self):
+        response = self.get(HTTP_RANGE='bytes=2048-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_offload_headers(self):
+        full_path = os.path.join(self.media_root, 'docs', 'terms of use.pdf')
+        with override_settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self.get()
+        self.assertEqual(response['X-Sendfile'], full_path)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_OFFLOAD='x-accel-redirect', MEDIA_OFFLOAD_PREFIX='/protected-media/'):
+            response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/docs/terms%20of%20use.pdf')
+        self.assertNotIn('X-Sendfile', response)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        availability.reset()
+        self.addCleanup(availability.reset)
+        self.user = User.objects.create_user(username='driver', password='secret-pass')
+        manufacturer = Manufacturer.objects.create(name='Dacia', founded_date=date(1966, 1, 1), global_sales=1.0)
+        self.a, self.b, self.c = [Car.objects.create(manufacturer=manufacturer, model=model, year=2020,
+                                                     transmission='Manual', price_per_day_usd=price)
+                                  for model, price in (('Logan', 30), ('Sandero', 40), ('Duster', 50))]
+        self.client.force_login(self.user)
+        today = date.today()
+        # One-day loans, booked both one at a time and in bulk, days ago per car.
+        for car, days_ago in ((self.a, 1), (self.a, 2), (self.b, 10), (self.c, 100), (self.c, 400)):
+            Car.objects.update(available=True)
+            day = today - timedelta(days=days_ago)
+            loan, error = book_car(self.user, car.id, day, day)
+            self.assertIsNone(error)
+        for days_ago in (20, 200, 500):
+            Car.objects.update(available=True)
+            day = str(today - timedelta(days=days_ago))
+            bookings = [{'car_id': car.id, 'start_date': day, 'end_date': day}
+                        for car in ((self.b, self.c) if days_ago == 20 else (self.c,))]
+            response = self.client.post('/api/rent/bulk/', json.dumps({'bookings': bookings}),
+                                        content_type='application/json')
+            self.assertEqual({result['status'] for result in response.json()['results']}, {'success'})
+        Car.objects.update(available=True)
+        book_car(self.user, self.b.id, today - timedelta(days=1), today - timedelta(days=1))
+
+    def ranking(self, days):
+        return [(car.model, car.rentals) for car in get_leaderboard(days=days)]
+
+    def test_ranks_cars_per_window(self):
+        self.assertEqual(self.ranking(7), [('Logan', 2), ('Sandero', 1)])
+        self.assertEqual(self.ranking(30), [('Sandero', 3), ('Logan', 2), ('Duster', 1)])
+        self.assertEqual(self.ranking(365), [('Sandero', 3), ('Duster', 3), ('Logan', 2)])
+        self.assertEqual(self.ranking(None), [('Duster', 5), ('Sandero', 3), ('Logan', 2)])
+        self.assertEqual(get_leaderboard(days=30)[0].revenue, Decimal('120.00'))
+        self.assertEqual(get_leaderboard(limit=1)[0].revenue, Decimal('250.00'))
+
+    def test_rebuild_reproduces_the_incremental_stats(self):
+        def snapshot():
+            return (list(Car.objects.order_by('id').values_list('id', 'rental_count', 'revenue_usd')),
+                    list(CarRentalDailyStats.objects.order_by('car_id', 'day')
+                         .values_list('car_id', 'day', 'rentals', 'revenue_usd')))
+
+        incremental = snapshot()
+        self.assertEqual(len(incremental[1]), 10)
+        Car.objects.update(rental_count=0, revenue_usd=0)
+        CarRentalDailyStats.objects.update(rentals=99)
+        rebuild_rental_stats()
+        self.assertEqual(snapshot(), incremental)
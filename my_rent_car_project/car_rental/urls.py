@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('', views.main_page, name='main_page'),
@@ -7,6 +7,9 @@ urlpatterns = [
     path('cars/', views.get_all_cars, name='get_all_cars'),
     path('cars/search/', views.search_car, name='search_car'),
     path('cars/add/', views.add_car, name='add_car'),
+    path('cars/available/', views.available_cars, name='available_cars'),
+    path('api/import-fleet/', views.import_fleet_upload, name='import_fleet_upload'),
+    path('api/export/<str:kind>/', views.export_data, name='export_data'),
     path('car/search/', views.search_car, name='search_car'),
     path('car-search/', views.car_search_page, name='car_search_page'),
     path('add_car/', views.add_car_page, name='add_car_page'),
@@ -18,6 +21,8 @@ urlpatterns = [
     path('login/', views.user_login, name='login'),
     path('rent_car/', views.rent_car, name='rent_car'),
     path('return_car/', views.return_car, name='return_car'),
+    path('api/rent/bulk/', views.bulk_rent_cars, name='bulk_rent_cars'),
+    path('api/return/bulk/', views.bulk_return_cars, name='bulk_return_cars'),
     path('logout/', views.user_logout, name='logout'),
     path('reset-passwords/', views.reset_password, name='reset_password'),
     path('my-rentals/', views.my_rentals_view, name='my_rentals'),
@@ -25,4 +30,10 @@ urlpatterns = [
     path('api/add-car-image/', views.add_car_image, name='add_car_image'),
     path('delete-images/', views.delete_images_by_id, name='delete_images'),
     path('top-cars/', views.top_cars_view, name='top_cars'),
+    path('api/cache-stats/', views.catalog_cache_stats, name='catalog_cache_stats'),
+    path('metrics', views.metrics, name='metrics'),
+    path('api/async/cars/search/', async_views.search_car, name='async_search_car'),
+    path('api/async/cars/add/', async_views.add_car, name='async_add_car'),
+    path('api/async/rent_car/', async_views.rent_car, name='async_rent_car'),
+    path('api/async/return_car/', async_views.return_car, name='async_return_car'),
 ]
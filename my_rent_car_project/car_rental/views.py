@@ -1,16 +1,65 @@
 from django.shortcuts import render,get_object_or_404, redirect
-from django.http import JsonResponse,HttpResponseForbidden
+from django.http import Http404,HttpResponse,JsonResponse,HttpResponseForbidden,StreamingHttpResponse
 from django.contrib import messages
-from .models import Car,Manufacturer,Loan,CarImage
+from .models import Car,Manufacturer,Loan,LoanArchive,CarImage
+from .search import search_cars
+from .availability import availability
+from .catalog_cache import cache_stats, cached_read, catalog_etag, catalog_last_modified, invalidate
+from .leaderboard import LEADERBOARD_WINDOWS, get_leaderboard, record_daily_stats
+from .images import schedule_variants, variant_urls
+from .storage import is_content_addressed
+from .metrics import render_prometheus
+from .db_router import read_from_replica
+from .passwords import HashingBusy, hash_password, verify_password
+from .file_serving import (IMMUTABLE_CACHE_CONTROL, PRECOMPRESSED_ENCODINGS, REVALIDATE_CACHE_CONTROL,
+                           file_response, precompressed_path, resolve)
+from .fleet_export import EXPORT_FORMATS, EXPORT_SPECS, iter_export, keyset_chunks
+from .fleet_import import IMPORT_FORMATS, IMPORT_KINDS, detect_format, import_fleet, iter_rows
+import io
 import json
+import mimetypes
 from decimal import Decimal
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login,logout
 from  datetime import datetime
 from django.contrib.auth.decorators import login_required,user_passes_test
 from django.utils import timezone
-from django.db.models import Count, Q
-
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Q, F, Value, Exists, OuterRef, Case, When, DecimalField
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.staticfiles.views import serve as staticfiles_serve
+from django.utils.cache import patch_vary_headers
+
+SEARCH_DEFAULT_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 500
+SEARCH_STREAM_CHUNK_SIZE = 1000
+FUZZY_SEARCH_DEFAULT_LIMIT = 20
+BULK_MAX_ITEMS = 500
+RENT_CONFLICT_ERROR = 'This car is already rented for the selected period.'
+RENT_RETRY_ERROR = 'The car could not be booked right now, please try again.'
+LIST_DEFAULT_PAGE_SIZE = 50
+LIST_MAX_PAGE_SIZE = 500
+CAR_LIST_SORT_FIELDS = {
+    'id': 'id',
+    'price': 'price_per_day_usd',
+    'year': 'year',
+    'model': 'model',
+}
+
+def catalog_conditional(shape):
+    # ETag/Last-Modified come from the catalog version stamps, so a client
+    # revalidating an unchanged page gets a 304 before the view runs.
+    def decorator(view_func):
+        view_func = condition(etag_func=lambda request, *args, **kwargs: catalog_etag(shape),
+                              last_modified_func=lambda request, *args, **kwargs: catalog_last_modified(shape))(view_func)
+        return cache_control(private=True, no_cache=True)(view_func)
+    return decorator
 
 def superuser_required(view_func):
     def _wrapped_view(request, *args, **kwargs):
@@ -29,21 +78,99 @@ def superuser_dashboard(request):
 def main_page(request):
     return render(request, 'car_rental/main_page.html')
 
+def keyset_paginate(queryset, field, after, page_size, descending=False):
+    # Orders by (field, id) and resumes after the cursor "<value>:<id>" of the
+    # previous page's last row, so every page is an index range scan.
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+    if after:
+        value, _, last_id = after.rpartition(':')
+        last_id = int(last_id)
+        beyond = 'lt' if descending else 'gt'
+        if field == 'id':
+            queryset = queryset.filter(**{f'id__{beyond}': last_id})
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__{beyond}': value}) | Q(**{field: value, f'id__{beyond}': last_id}))
+
+    page = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        last = page[-1]
+        next_cursor = f'{getattr(last, field)}:{last.id}'
+    return page, next_cursor
+
+def keyset_paginate_union(querysets, field, after, page_size, descending=False):
+    # keyset_paginate over several tables holding disjoint ids: each returns
+    # its own next page, and the merged (field, id) order picks the rows.
+    rows = []
+    more = False
+    for queryset in querysets:
+        page, next_cursor = keyset_paginate(queryset, field, after, page_size, descending)
+        rows.extend(page)
+        more = more or next_cursor is not None
+    rows.sort(key=lambda row: (getattr(row, field), row.id), reverse=descending)
+    more = more or len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = f'{getattr(rows[-1], field)}:{rows[-1].id}' if more else None
+    return rows, next_cursor
+
+def page_query(params, cursor):
+    params = params.copy()
+    params.pop('after', None)
+    if cursor is not None:
+        params['after'] = cursor
+    return params.urlencode()
+
+def read_page_size(params, default):
+    try:
+        page_size = int(params.get('page_size', default))
+    except ValueError:
+        page_size = default
+    return max(1, min(page_size, LIST_MAX_PAGE_SIZE))
+
 @login_required
+@catalog_conditional('car_list')
+@read_from_replica('car_list')
 def get_all_cars(request):
-    if not request.user.is_authenticated:
-        return redirect('login')
-    cars = Car.objects.all().order_by('id')
-    return render(request, 'car_rental/cars_list.html', {'cars': cars})
+    sort = request.GET.get('sort', 'id')
+    if sort.lstrip('-') not in CAR_LIST_SORT_FIELDS:
+        sort = 'id'
+    page_size = read_page_size(request.GET, LIST_DEFAULT_PAGE_SIZE)
+
+    def load_page():
+        cars = (Car.objects.filter(build_car_filters(request.GET))
+                .select_related('manufacturer')
+                .only('id', 'model', 'year', 'transmission', 'price_per_day_usd', 'available', 'manufacturer__name'))
+        return keyset_paginate(cars, CAR_LIST_SORT_FIELDS[sort.lstrip('-')], request.GET.get('after'),
+                               page_size, descending=sort.startswith('-'))
 
-@login_required
-def search_car(request):
-    model_query = request.GET.get('model', '')
-    year_query = request.GET.get('year', '')
-    transmission_query = request.GET.get('transmission', '')
-    min_price = request.GET.get('min_price', '')
-    max_price = request.GET.get('max_price', '')
-    available_query = request.GET.get('available', '')
+    try:
+        cars, next_cursor = cached_read('car_list', sorted(request.GET.lists()), load_page)
+    except (ValueError, ValidationError):
+        return redirect('get_all_cars')
+
+    return render(request, 'car_rental/cars_list.html', {
+        'cars': cars,
+        'filters': request.GET,
+        'sort': sort,
+        'page_size': page_size,
+        'first_query': page_query(request.GET, None) if request.GET.get('after') else None,
+        'next_query': page_query(request.GET, next_cursor) if next_cursor else None,
+    })
+
+def flag_is(field, value):
+    # Compare the boolean column against a literal; a bare `WHERE flag`
+    # (Django's default on SQLite) cannot lead a composite index.
+    return Exact(F(field), Value(value))
+
+def build_car_filters(params):
+    model_query = params.get('model', '')
+    year_query = params.get('year', '')
+    transmission_query = params.get('transmission', '')
+    min_price = params.get('min_price', '')
+    max_price = params.get('max_price', '')
+    available_query = params.get('available', '')
 
     filters = Q()
 
@@ -54,7 +181,8 @@ def search_car(request):
         filters &= Q(year=year_query)
 
     if transmission_query:
-        filters &= Q(transmission__iexact=transmission_query)
+        # Compared as LOWER(transmission) so cars_transmission_lower_idx can serve it.
+        filters &= Q(Exact(Lower('transmission'), transmission_query.lower()))
 
     if min_price:
         filters &= Q(price_per_day_usd__gte=min_price)
@@ -64,31 +192,111 @@ def search_car(request):
 
     if available_query:
         if available_query.lower() in ['true', '1']:
-            filters &= Q(available=True)
+            filters &= Q(flag_is('available', True))
         elif available_query.lower() in ['false', '0']:
-            filters &= Q(available=False)
-
-    cars = Car.objects.filter(filters).select_related('manufacturer', 'image')
-
-    result = []
-    for car in cars:
-        image_url = ''
-        if hasattr(car, 'image') and car.image:
-            image_url = car.image.image.url
-
-        result.append({
-            "id": car.id,
-            "manufacturer": car.manufacturer.name,
-            "model": car.model,
-            "year": car.year,
-            "transmission": car.transmission,
-            "price_per_day_usd": str(car.price_per_day_usd),
-            "available": car.available,
-            "image_url": image_url,
-        })
+            filters &= Q(flag_is('available', False))
+
+    return filters
+
+def serialize_car(car):
+    image_url = thumbnail_url = srcset = webp_srcset = ''
+    if hasattr(car, 'image') and car.image:
+        image_url = car.image.image.url
+        thumbnail_url, srcset, webp_srcset = variant_urls(car.image)
+
+    return {
+        "id": car.id,
+        "manufacturer": car.manufacturer.name,
+        "model": car.model,
+        "year": car.year,
+        "transmission": car.transmission,
+        "price_per_day_usd": str(car.price_per_day_usd),
+        "available": car.available,
+        "image_url": image_url,
+        "thumbnail_url": thumbnail_url,
+        "srcset": srcset,
+        "webp_srcset": webp_srcset,
+    }
+
+def stream_cars_json(cars, chunk_size=SEARCH_STREAM_CHUNK_SIZE):
+    # Emits a JSON array one keyset chunk of rows at a time so only
+    # `chunk_size` cars are ever held in memory.
+    yield '['
+    first = True
+    for chunk in keyset_chunks(cars, chunk_size):
+        yield ('' if first else ',') + ','.join(json.dumps(serialize_car(car)) for car in chunk)
+        first = False
+    yield ']'
+
+def fuzzy_search_car(request):
+    query = request.GET.get('q', '') or request.GET.get('model', '')
+    try:
+        limit = int(request.GET.get('limit') or FUZZY_SEARCH_DEFAULT_LIMIT)
+    except ValueError:
+        return JsonResponse({"detail": "limit must be an integer."}, status=400)
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+
+    params = request.GET.copy()
+    params.pop('model', None)
+
+    def load_results():
+        result = []
+        for car, score in search_cars(query, filters=build_car_filters(params), limit=limit):
+            item = serialize_car(car)
+            item["score"] = round(score, 3)
+            result.append(item)
+        return result
 
+    result = cached_read('search', sorted(request.GET.lists()), load_results)
     return JsonResponse(result, safe=False)
 
+@login_required
+@catalog_conditional('search')
+@read_from_replica('search')
+def search_car(request):
+    if request.GET.get('mode', '') == 'fuzzy':
+        return fuzzy_search_car(request)
+
+    filters = build_car_filters(request.GET)
+    cars = Car.objects.filter(filters).select_related('manufacturer', 'image').order_by('id')
+
+    if request.GET.get('stream', '').lower() in ['true', '1']:
+        # The body is read after read_from_replica has reset, so pin the
+        # database the router picks now.
+        return StreamingHttpResponse(stream_cars_json(cars.using(cars.db)), content_type='application/json')
+
+    after_id = request.GET.get('after_id', '')
+    limit = request.GET.get('limit', '')
+
+    if not after_id and not limit:
+        result = cached_read('search', sorted(request.GET.lists()),
+                             lambda: [serialize_car(car) for car in cars])
+        return JsonResponse(result, safe=False)
+
+    try:
+        after_id = int(after_id) if after_id else 0
+        limit = int(limit) if limit else SEARCH_DEFAULT_PAGE_SIZE
+    except ValueError:
+        return JsonResponse({"detail": "after_id and limit must be integers."}, status=400)
+
+    if limit < 1:
+        return JsonResponse({"detail": "limit must be a positive integer."}, status=400)
+    limit = min(limit, SEARCH_MAX_PAGE_SIZE)
+
+    def load_page():
+        # Keyset pagination: fetch one extra row to know if another page exists.
+        page = list(cars.filter(id__gt=after_id)[:limit + 1])
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = page[-1].id
+        return {
+            "results": [serialize_car(car) for car in page],
+            "next_cursor": next_cursor,
+        }
+
+    return JsonResponse(cached_read('search', sorted(request.GET.lists()), load_page))
+
 @login_required
 def car_search_page(request):
     return render(request, 'car_rental/car_search.html')
@@ -124,6 +332,35 @@ def add_car(request):
     else:
         return JsonResponse({"detail": "Method not allowed."}, status=405)
 
+@superuser_required
+def import_fleet_upload(request):
+    if request.method != 'POST':
+        return JsonResponse({"detail": "Method not allowed."}, status=405)
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({"detail": "A CSV or JSONL file is required."}, status=400)
+    kind = request.POST.get('kind', 'cars')
+    fmt = request.POST.get('format') or detect_format(upload.name)
+    if kind not in IMPORT_KINDS or fmt not in IMPORT_FORMATS:
+        return JsonResponse({"detail": "Unsupported kind or format."}, status=400)
+
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        report = import_fleet(iter_rows(stream, fmt), kind=kind)
+    except UnicodeDecodeError:
+        return JsonResponse({"detail": "The file must be UTF-8 encoded."}, status=400)
+    return JsonResponse(report)
+
+@superuser_required
+def export_data(request, kind):
+    fmt = request.GET.get('format', 'csv')
+    if kind not in EXPORT_SPECS or fmt not in EXPORT_FORMATS:
+        return JsonResponse({"detail": "Unsupported kind or format."}, status=400)
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(iter_export(kind, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
 @superuser_required
 def add_car_page(request):
     return render(request, 'car_rental/add_car.html')
@@ -148,8 +385,10 @@ def delete_car_graphic(request):
     return render(request, 'car_rental/delete_car_form.html', {'message': message})
 
 @login_required
+@catalog_conditional('manufacturers')
+@read_from_replica('manufacturers')
 def list_manufacturers(request):
-    manufacturers = Manufacturer.objects.all().order_by('name')
+    manufacturers = cached_read('manufacturers', {}, lambda: list(Manufacturer.objects.all().order_by('name')))
     return render(request, 'car_rental/manufacturers_list.html', {'manufacturers': manufacturers})
 
 @superuser_required
@@ -222,14 +461,19 @@ def register(request):
             message = "Email already exists."
             return render(request, 'car_rental/register.html', {'message': message})
 
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password,
+        try:
+            hashed_password = hash_password(password)
+        except HashingBusy:
+            return render(request, 'car_rental/register.html',
+                          {'message': 'Too many sign-ups right now, please try again.'}, status=503)
+        # What create_user() does, with the hash already made on the hashing pool.
+        User.objects.create(
+            username=User.normalize_username(username),
+            email=User.objects.normalize_email(email),
+            password=hashed_password,
             first_name=first_name,
-            last_name=last_name
+            last_name=last_name,
         )
-        user.save()
         message = "User successfully registered."
         return render(request, 'car_rental/register.html', {'message': message})
     else:
@@ -240,13 +484,12 @@ def user_login(request):
         username = request.POST.get('username', '').strip()
         password = request.POST.get('password', '').strip()
 
+        # authenticate() looks the user up itself and answers None for an unknown name.
         try:
-            user_obj = User.objects.get(username=username)
-        except User.DoesNotExist:
-            messages.error(request, 'Incorrect username or password.')
-            return render(request, 'car_rental/login_page.html')
-
-        user = authenticate(request, username=username, password=password)
+            user = authenticate(request, username=username, password=password)
+        except HashingBusy:
+            messages.error(request, 'Too many sign-ins right now, please try again.')
+            return render(request, 'car_rental/login_page.html', status=503)
         if user is not None:
             login(request, user)
             if user.is_superuser:
@@ -254,7 +497,7 @@ def user_login(request):
             else:
                 return redirect('main_page')
         else:
-            messages.error(request, 'Incorrect username or password.DSS')
+            messages.error(request, 'Incorrect username or password.')
             return render(request, 'car_rental/login_page.html')
 
     return render(request, 'car_rental/login_page.html')
@@ -271,83 +514,163 @@ def reset_password(request):
         old_password = request.POST.get('old_password')
         new_password = request.POST.get('new_password')
 
-        user_auth = authenticate(username=user.username, password=old_password)
-        if user_auth is None:
-            messages.error(request, 'Old password is incorrect.')
-            return render(request, 'car_rental/reset_password.html')
+        # request.user is already loaded; no need for authenticate() to fetch it again.
+        try:
+            if not verify_password(user, old_password):
+                messages.error(request, 'Old password is incorrect.')
+                return render(request, 'car_rental/reset_password.html')
+        except HashingBusy:
+            messages.error(request, 'The server is busy, please try again.')
+            return render(request, 'car_rental/reset_password.html', status=503)
 
         if old_password == new_password:
             messages.error(request, 'The new password cannot be the same as the old password.')
             return render(request, 'car_rental/reset_password.html')
 
         try:
-            user.set_password(new_password)
-            user.save()
+            user.password = hash_password(new_password)
+            # Saving drops the cached user (signals.forget_changed_user), so other
+            # sessions stop validating against the old password hash.
+            # Only the password: the user may be a cached copy up to
+            # AUTH_USER_CACHE_TIMEOUT old, and its other columns must not be written back.
+            user.save(update_fields=['password'])
             messages.success(request, 'Your password has been successfully changed. You have been logged out.')
             logout(request)
         except Exception as e:
             messages.error(request, f'An error occurred: {e}')
     return render(request, 'car_rental/reset_password.html')
 
-@login_required
-def rent_car(request):
-    if request.method != 'POST':
-        return render(request, 'car_rental/rent_car.html')
+def book_car(user, car_id, start_date, end_date):
+    # One transaction: the car row is locked and checked for overlapping loans
+    # in a single SELECT ... FOR UPDATE, then claimed with a conditional UPDATE
+    # (which also guards backends that ignore row locks) before the loan is
+    # inserted and its daily leaderboard bucket is bumped.
+    with transaction.atomic():
+        conflicting_rentals = Loan.objects.filter(
+            car=OuterRef('pk'),
+            rent_date__lte=end_date,
+            return_date__gte=start_date
+        )
+        car = (Car.objects.select_for_update()
+               .annotate(has_conflict=Exists(conflicting_rentals))
+               .filter(id=car_id)
+               .first())
+
+        if car is None:
+            return None, 'Car not found.'
+
+        if car.has_conflict:
+            return None, 'This car is already rented for the selected period.'
+
+        delta = end_date - start_date
+        days = delta.days + 1
+        total_price = days * car.price_per_day_usd
+
+        # Claiming the car also bumps the leaderboard counters in the same UPDATE.
+        claimed = car.available and Car.objects.filter(id=car.id, available=True).update(
+            available=False,
+            rental_count=F('rental_count') + 1,
+            revenue_usd=F('revenue_usd') + total_price,
+        )
+        if not claimed:
+            return None, 'Car is not available.'
+
+        loan = Loan.objects.create(
+            car=car,
+            user=user,
+            rent_date=start_date,
+            return_date=end_date,
+            total_price=total_price
+        )
+        record_daily_stats([loan])
+    return loan, None
+
+def parse_rent_request(request):
+    """Reads the rent_car JSON body. Returns ((car_id, start_date, end_date), None)
+    or (None, context) with what the rent_car page should show instead."""
     try:
         data = json.loads(request.body.decode('utf-8'))
     except json.JSONDecodeError:
-        return render(request, 'car_rental/rent_car.html')
+        return None, {}
+    if not isinstance(data, dict):
+        return None, {'error': 'Missing required fields.'}
 
     car_id = data.get('car_id')
     start_date_str = data.get('start_date')
     end_date_str = data.get('end_date')
 
     if not all([car_id, start_date_str, end_date_str]):
-        return render(request, 'car_rental/rent_car.html', {'error': 'Missing required fields.'})
+        return None, {'error': 'Missing required fields.'}
 
     try:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
     except ValueError:
-        return render(request, 'car_rental/rent_car.html', {'error': 'Invalid date format.'})
+        return None, {'error': 'Invalid date format.'}
 
     if start_date > end_date:
-        return render(request, 'car_rental/rent_car.html', {'error': 'Start date must be before end date.'})
+        return None, {'error': 'Start date must be before end date.'}
+
+    try:
+        car_id = int(car_id)
+    except (TypeError, ValueError):
+        return None, {'error': 'Car not found.'}
+    return (car_id, start_date, end_date), None
+
+@login_required
+def rent_car(request):
+    if request.method != 'POST':
+        return render(request, 'car_rental/rent_car.html')
+    booking, context = parse_rent_request(request)
+    if booking is None:
+        return render(request, 'car_rental/rent_car.html', context)
+    car_id, start_date, end_date = booking
+
+    # The availability engine can reject a conflicting period without a query;
+    # a "free" answer is still confirmed against the DB below.
+    if availability.has_conflict(car_id, start_date, end_date):
+        return render(request, 'car_rental/rent_car.html', {'error': RENT_CONFLICT_ERROR})
 
     try:
-        car = Car.objects.get(id=car_id)
-    except Car.DoesNotExist:
-        return render(request, 'car_rental/rent_car.html', {'error': 'Car not found.'})
-
-    conflicting_rentals = Loan.objects.filter(
-        car=car,
-        rent_date__lte=end_date,
-        return_date__gte=start_date
-    )
-
-    if conflicting_rentals.exists():
-        return render(request, 'car_rental/rent_car.html',
-                      {'error': 'This car is already rented for the selected period.'})
-
-    if not car.available:
-        return render(request, 'car_rental/rent_car.html', {'error': 'Car is not available.'})
-
-    delta = end_date - start_date
-    days = delta.days + 1
-    total_price = days * car.price_per_day_usd
-
-    car.available = False
-    car.save()
-
-    Loan.objects.create(
-        car=car,
-        user=request.user,
-        rent_date=start_date,
-        return_date=end_date,
-        total_price=total_price
-    )
+        loan, error = book_car(request.user, car_id, start_date, end_date)
+    except DatabaseError:
+        return render(request, 'car_rental/rent_car.html', {'error': RENT_RETRY_ERROR})
+    if error:
+        return render(request, 'car_rental/rent_car.html', {'error': error})
+
     return render(request, 'car_rental/rent_car.html', {'message': 'You booked successfully!',
-                                                                            'total_price': total_price})
+                                                        'total_price': loan.total_price})
+
+@login_required
+def available_cars(request):
+    try:
+        start_date = datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.GET.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({"detail": "start and end must be dates in YYYY-MM-DD format."}, status=400)
+
+    if start_date > end_date:
+        return JsonResponse({"detail": "Start date must be before end date."}, status=400)
+
+    cars = {car.id: car for car in Car.objects.filter(flag_is('available', True))
+            .select_related('manufacturer', 'image').order_by('id')}
+    free_ids = availability.free_car_ids(cars, start_date, end_date)
+    if free_ids is None:
+        busy_ids = set(Loan.objects.filter(rent_date__lte=end_date, return_date__gte=start_date)
+                       .values_list('car_id', flat=True))
+        free_ids = [car_id for car_id in cars if car_id not in busy_ids]
+
+    return JsonResponse([serialize_car(cars[car_id]) for car_id in free_ids], safe=False)
+
+def close_loan(loan):
+    """Frees the loan's car and marks the loan returned in one transaction.
+    Returns False, changing nothing, if the car no longer exists."""
+    with transaction.atomic():
+        if not Car.objects.filter(id=loan.car_id).update(available=True):
+            return False
+        loan.returned = True
+        loan.save(update_fields=['returned'])
+    return True
 
 @login_required
 def return_car(request):
@@ -358,35 +681,206 @@ def return_car(request):
         data = json.loads(request.body)
         car_id = data.get('car_id')
 
-        username = request.user.username
-
-        loan = Loan.objects.filter(car_id=car_id, returned=False).order_by('-rent_date').first()
+        loan = Loan.objects.filter(flag_is('returned', False), car_id=car_id).order_by('-rent_date').first()
 
         if not loan:
             return JsonResponse({'status': 'error', 'message': 'This car is not currently rented.'})
 
-        if loan.user.username != username:
+        if loan.user_id != request.user.id:
             return JsonResponse({'status': 'error', 'message': 'You did not rent this car.'})
 
-        try:
-            car = Car.objects.get(id=car_id)
-            car.available = True
-            car.save()
-        except Car.DoesNotExist:
+        if not close_loan(loan):
             return JsonResponse({'status': 'error', 'message': 'Car not found.'})
-
-        loan.returned = True
-        loan.save()
+        # update() sends no signals, so the car's cached catalog entries are dropped here.
+        invalidate(Car)
 
         return JsonResponse({'status': 'success', 'message': 'Car returned successfully.'})
     else:
         return JsonResponse({'status': 'error', 'message': 'Method not allowed.'}, status=405)
 
+def parse_bulk_items(request, key):
+    if request.method != 'POST':
+        return None, JsonResponse({'status': 'error', 'message': 'Method not allowed.'}, status=405)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return None, JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, JsonResponse({'status': 'error', 'message': f'"{key}" must be a non-empty list.'}, status=400)
+    if len(items) > BULK_MAX_ITEMS:
+        return None, JsonResponse({'status': 'error', 'message': f'At most {BULK_MAX_ITEMS} items per request.'},
+                                  status=400)
+    return items, None
+
+@login_required
+def bulk_rent_cars(request):
+    items, error_response = parse_bulk_items(request, 'bookings')
+    if error_response:
+        return error_response
+
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        try:
+            car_id = int(item['car_id'])
+            start_date = datetime.strptime(item['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(item['end_date'], '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError):
+            results[index] = {'status': 'error', 'message': 'car_id, start_date and end_date (YYYY-MM-DD) are required.'}
+            continue
+        if start_date > end_date:
+            results[index] = {'car_id': car_id, 'status': 'error', 'message': 'Start date must be before end date.'}
+            continue
+        pending.append((index, car_id, start_date, end_date))
+
+    loans = []
+    if pending:
+        car_ids = sorted({car_id for _, car_id, _, _ in pending})
+        try:
+            with transaction.atomic():
+                cars = Car.objects.select_for_update().filter(id__in=car_ids).order_by('id').in_bulk()
+                # One set-based query for every period that could overlap any booking.
+                booked = {}
+                for car_id, rent_date, return_date in Loan.objects.filter(
+                        car_id__in=car_ids,
+                        rent_date__lte=max(end for _, _, _, end in pending),
+                        return_date__gte=min(start for _, _, start, _ in pending)
+                ).values_list('car_id', 'rent_date', 'return_date'):
+                    booked.setdefault(car_id, []).append((rent_date, return_date))
+
+                claimed = set()
+                for index, car_id, start_date, end_date in pending:
+                    car = cars.get(car_id)
+                    if car is None:
+                        results[index] = {'car_id': car_id, 'status': 'error', 'message': 'Car not found.'}
+                    elif any(rent <= end_date and ret >= start_date for rent, ret in booked.get(car_id, [])):
+                        results[index] = {'car_id': car_id, 'status': 'error',
+                                          'message': 'This car is already rented for the selected period.'}
+                    elif not car.available or car_id in claimed:
+                        results[index] = {'car_id': car_id, 'status': 'error', 'message': 'Car is not available.'}
+                    else:
+                        claimed.add(car_id)
+                        total_price = ((end_date - start_date).days + 1) * car.price_per_day_usd
+                        loans.append((index, Loan(car=car, user=request.user, rent_date=start_date,
+                                                  return_date=end_date, total_price=total_price)))
+
+                while loans:
+                    claimed_ids = [loan.car_id for _, loan in loans]
+                    revenue = Case(*[When(id=loan.car_id, then=Value(loan.total_price)) for _, loan in loans],
+                                   output_field=DecimalField())
+                    with transaction.atomic():
+                        updated = Car.objects.filter(id__in=claimed_ids, available=True).update(
+                            available=False,
+                            rental_count=F('rental_count') + 1,
+                            revenue_usd=F('revenue_usd') + revenue,
+                        )
+                        if updated != len(claimed_ids):
+                            transaction.set_rollback(True)
+                    if updated == len(claimed_ids):
+                        break
+                    # Some car was claimed in the meantime (the row locks are a no-op
+                    # on some backends): undo the claim and retry with the cars still free.
+                    still_free = set(Car.objects.filter(id__in=claimed_ids, available=True)
+                                     .values_list('id', flat=True))
+                    for index, loan in loans:
+                        if loan.car_id not in still_free:
+                            results[index] = {'car_id': loan.car_id, 'status': 'error',
+                                              'message': 'Car is not available.'}
+                    loans = [(index, loan) for index, loan in loans if loan.car_id in still_free]
+
+                if loans:
+                    Loan.objects.bulk_create([loan for _, loan in loans])
+                    record_daily_stats([loan for _, loan in loans])
+                    invalidate(Car, Loan)
+                    # bulk_create skips post_save, so feed the availability engine directly.
+                    periods = [(loan.car_id, loan.rent_date, loan.return_date) for _, loan in loans]
+
+                    def track_periods():
+                        for period in periods:
+                            availability.add(*period)
+                    transaction.on_commit(track_periods)
+        except DatabaseError:
+            return JsonResponse({'status': 'error', 'message': RENT_RETRY_ERROR}, status=503)
+
+    for index, loan in loans:
+        results[index] = {'car_id': loan.car_id, 'status': 'success', 'message': 'You booked successfully!',
+                          'total_price': str(loan.total_price)}
+    return JsonResponse({'results': results})
+
+@login_required
+def bulk_return_cars(request):
+    items, error_response = parse_bulk_items(request, 'returns')
+    if error_response:
+        return error_response
+
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        try:
+            pending.append((index, int(item['car_id'])))
+        except (KeyError, TypeError, ValueError):
+            results[index] = {'status': 'error', 'message': 'car_id is required.'}
+
+    returned = []
+    if pending:
+        car_ids = sorted({car_id for _, car_id in pending})
+        with transaction.atomic():
+            open_loans = {}
+            for loan in (Loan.objects.select_for_update()
+                         .filter(flag_is('returned', False), car_id__in=car_ids)
+                         .order_by('car_id', '-rent_date')):
+                open_loans.setdefault(loan.car_id, loan)
+
+            for index, car_id in pending:
+                loan = open_loans.get(car_id)
+                if loan is None or loan.returned:
+                    results[index] = {'car_id': car_id, 'status': 'error', 'message': 'This car is not currently rented.'}
+                elif loan.user_id != request.user.id:
+                    results[index] = {'car_id': car_id, 'status': 'error', 'message': 'You did not rent this car.'}
+                else:
+                    loan.returned = True
+                    returned.append((index, loan))
+
+            if returned:
+                Loan.objects.filter(id__in=[loan.id for _, loan in returned]).update(returned=True)
+                Car.objects.filter(id__in=[loan.car_id for _, loan in returned]).update(available=True)
+        if returned:
+            invalidate(Car, Loan)
+
+    for index, loan in returned:
+        results[index] = {'car_id': loan.car_id, 'status': 'success', 'message': 'Car returned successfully.'}
+    return JsonResponse({'results': results})
+
 @login_required
 def my_rentals_view(request):
-    rentals = Loan.objects.filter(user=request.user)
+    page_size = read_page_size(request.GET, LIST_DEFAULT_PAGE_SIZE)
+    # Loans moved to the archive by archive_loans are only read when asked for.
+    sources = [Loan, LoanArchive] if request.GET.get('archived', '').lower() in ['true', '1'] else [Loan]
+    try:
+        histories = []
+        for model in sources:
+            rentals = (model.objects.filter(user=request.user)
+                       .select_related('car')
+                       .only('id', 'rent_date', 'return_date', 'total_price', 'returned', 'car__id', 'car__model'))
+            if request.GET.get('from'):
+                rentals = rentals.filter(rent_date__gte=datetime.strptime(request.GET['from'], '%Y-%m-%d').date())
+            if request.GET.get('to'):
+                rentals = rentals.filter(rent_date__lte=datetime.strptime(request.GET['to'], '%Y-%m-%d').date())
+            histories.append(rentals)
+        rentals, next_cursor = keyset_paginate_union(histories, 'rent_date', request.GET.get('after'), page_size,
+                                                     descending=True)
+    except (ValueError, ValidationError):
+        return redirect('my_rentals')
+
     today = timezone.now().date()
-    return render(request, 'car_rental/my_rentals.html', {'rentals': rentals, 'today': today})
+    return render(request, 'car_rental/my_rentals.html', {
+        'rentals': rentals,
+        'today': today,
+        'filters': request.GET,
+        'first_query': page_query(request.GET, None) if request.GET.get('after') else None,
+        'next_query': page_query(request.GET, next_cursor) if next_cursor else None,
+    })
 
 @superuser_required
 def add_car_image(request):
@@ -401,7 +895,8 @@ def add_car_image(request):
             if hasattr(car, 'image'):
                 return JsonResponse({"status": "error", "message": "This car already has an image. Only one image per car is allowed."})
 
-            CarImage.objects.create(car=car, image=image_file)
+            car_image = CarImage.objects.create(car=car, image=image_file)
+            schedule_variants(car_image.id)
             return JsonResponse({"status": "success"})
         except Exception as e:
             return JsonResponse({"status": "error", "message": str(e)})
@@ -435,13 +930,50 @@ def delete_images_by_id(request):
     return render(request, 'car_rental/delete_images.html', {'message': message})
 
 
-def get_top_rented_cars(limit=10):
-    top_cars = Car.objects.annotate(
-        rental_count=Count('loans')
-    ).order_by('-rental_count')[:limit]
-    return top_cars
+@superuser_required
+def catalog_cache_stats(request):
+    return JsonResponse(cache_stats())
+
+@superuser_required
+def metrics(request):
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def get_top_rented_cars(limit=10, days=None):
+    return get_leaderboard(limit=limit, days=days)
 
 @login_required
+@catalog_conditional('top_cars')
+@read_from_replica('top_cars')
 def top_cars_view(request):
-    top_cars = get_top_rented_cars()
-    return render(request, 'car_rental/top_cars.html', {'top_cars': top_cars})
\ No newline at end of file
+    days = request.GET.get('days', '')
+    days = int(days) if days.isdigit() and int(days) in LEADERBOARD_WINDOWS else None
+    top_cars = cached_read('top_cars', {'days': days}, lambda: get_top_rented_cars(days=days))
+    return render(request, 'car_rental/top_cars.html', {'top_cars': top_cars, 'days': days,
+                                                        'windows': LEADERBOARD_WINDOWS})
+
+
+def serve_media(request, path):
+    full_path = resolve(settings.MEDIA_ROOT, path)
+    # A content-addressed name always maps to the same bytes.
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_content_addressed(path) else REVALIDATE_CACHE_CONTROL
+    return file_response(request, full_path, path, cache_control, offload=bool(settings.MEDIA_OFFLOAD))
+
+
+def serve_static(request, path):
+    if path.endswith(tuple(suffix for _, suffix in PRECOMPRESSED_ENCODINGS)):
+        # Compressed copies are only sent as the encoding of their source file.
+        raise Http404('File not found')
+    try:
+        full_path = resolve(settings.STATIC_ROOT, path)
+    except Http404:
+        if settings.DEBUG:
+            # Not collected yet; fall back to the app finders.
+            return staticfiles_serve(request, path, insecure=True)
+        raise
+    is_hashed = getattr(staticfiles_storage, 'is_hashed', None)
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_hashed and is_hashed(path) else REVALIDATE_CACHE_CONTROL
+    content_type = mimetypes.guess_type(path)[0]
+    served_path, encoding = precompressed_path(request, full_path)
+    response = file_response(request, served_path, path, cache_control, content_type=content_type, encoding=encoding)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -35,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'car_rental.middleware.PerformanceMiddleware',
+    'car_rental.db_router.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,16 +69,174 @@ WSGI_APPLICATION = 'my_rent_car_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse is opt-in, all from .env; by default every request opens
+# and closes its own connection, as Django does. DB_CONN_MAX_AGE keeps each
+# worker thread's connection open across requests for that many seconds
+# ("none" = forever); DB_CONN_HEALTH_CHECKS pings a reused connection before
+# the request that picks it up, so one dropped by MySQL's wait_timeout is
+# replaced instead of failing the request. Leave DB_CONN_MAX_AGE at 0 under
+# ASGI (the async views): each request runs in its own thread there, so kept
+# connections are never reused and pile up instead.
+# DB_POOL instead shares up to DB_POOL_MAX_SIZE connections between all threads
+# of the process (requests wait DB_POOL_TIMEOUT seconds for one). Connections
+# are pinged on checkout and replaced after DB_POOL_MAX_LIFETIME seconds, or
+# DB_POOL_MAX_IDLE seconds unused; keep both below wait_timeout. Pooling needs
+# DB_CONN_MAX_AGE=0 and is the better fit when threads outnumber the
+# connections MySQL allows (max_connections / processes).
+DB_POOL = os.getenv('DB_POOL', 'false').lower() == 'true'
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '0')
+DB_CONN_MAX_AGE = None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true'
+
 DATABASES = { 'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'car_rental.db_backends.mysql_pool' if DB_POOL else 'django.db.backends.mysql',
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'OPTIONS': {
+            'pool': {
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+                'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+                'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 600)),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Read replica. With DB_REPLICA_HOST set, the catalog and reporting views
+# (db_router.read_from_replica) read from the "replica" alias; writes and all
+# other reads stay on the primary. DB_REPLICA_LAG is how far the replica may
+# trail the primary, in seconds: a client that just booked or returned a car
+# reads from the primary for that long, and so does everyone while the data
+# behind a page changed that recently.
+DATABASE_REPLICA_ALIAS = 'replica'
+DATABASE_REPLICA_LAG = float(os.getenv('DB_REPLICA_LAG', 2))
+DATABASE_ROUTERS = ['car_rental.db_router.ReplicaRouter']
+
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES[DATABASE_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests read the replica from the primary's test database.
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Caches
+# The catalog cache holds read-through results for the car and manufacturer
+# pages. CATALOG_CACHE_BACKEND selects an in-process LRU ("locmem", capped at
+# CATALOG_CACHE_MAX_ENTRIES), a shared directory ("file") or no caching ("dummy").
+# locmem invalidation only reaches the worker that made the write. Entries,
+# version counters and the ETags built from them all expire after
+# CATALOG_CACHE_TIMEOUT, so other workers serve (and answer 304 for) stale data
+# for at most that long; use "file" with several workers to share invalidation.
+
+CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'locmem')
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))
+
+CATALOG_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 1000))},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'catalog')),
+        'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 1000))},
+    },
+    'dummy': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+# Cache behind cached sessions and users: "locmem" or "file". As with the
+# catalog, locmem invalidation stays in one worker, so with several workers use
+# "file"; otherwise a changed password is only seen elsewhere after
+# AUTH_USER_CACHE_TIMEOUT.
+SESSION_CACHE_BACKEND = os.getenv('SESSION_CACHE_BACKEND', 'locmem')
+SESSION_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('SESSION_CACHE_MAX_ENTRIES', 10000))},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SESSION_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'sessions')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('SESSION_CACHE_MAX_ENTRIES', 10000))},
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': CATALOG_CACHE_BACKENDS[CATALOG_CACHE_BACKEND],
+    'sessions': SESSION_CACHE_BACKENDS[SESSION_CACHE_BACKEND],
+}
+
+# Sessions and the logged-in user
+# SESSION_MODE picks where sessions live: "db" (one query per request),
+# "cached_db" (cache first, written through to the DB), "cache" (cache only,
+# lost on eviction or restart) or "signed_cookies" (no server-side state, but a
+# logged-out cookie stays valid until it expires).
+SESSION_MODE = os.getenv('SESSION_MODE', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# The user loaded for each authenticated request is cached as well, and dropped
+# whenever the user row is saved (e.g. a password change in reset_password).
+AUTHENTICATION_BACKENDS = ['car_rental.auth_backends.CachedModelBackend']
+AUTH_USER_CACHE_ALIAS = 'sessions'
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60))
+
+# Password hashing
+# PASSWORD_HASHING picks the hasher for new and rehashed passwords: "pbkdf2"
+# (Django's default), or opt in to "scrypt" (stdlib, memory-hard, far cheaper in
+# CPU than PBKDF2 at comparable strength) or "argon2" (needs argon2-cffi).
+# The others stay listed so existing hashes still verify; a user whose hash was
+# made with another hasher or other costs is rehashed on their next login.
+PASSWORD_HASHING = os.getenv('PASSWORD_HASHING', 'pbkdf2')
+PASSWORD_HASHER_CLASSES = {
+    'scrypt': 'car_rental.passwords.TunedScryptPasswordHasher',
+    'argon2': 'car_rental.passwords.TunedArgon2PasswordHasher',
+    'pbkdf2': 'car_rental.passwords.TunedPBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHING]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHING
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 1_000_000))
+# N (a power of two), r and p; N * r * 128 bytes of memory per hash (16 MiB by default).
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.getenv('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.getenv('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.getenv('PASSWORD_SCRYPT_PARALLELISM', 1))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_ARGON2_MEMORY_COST', 102400))  # KiB
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 8))
+# At most this many hashes run at once per process (the request thread waits for
+# its own), so a login burst uses at most that many cores; beyond
+# PASSWORD_HASHING_QUEUE waiting hashes, login and register answer 503.
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASHING_QUEUE = int(os.getenv('PASSWORD_HASHING_QUEUE', 32))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -122,4 +282,51 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# With STATIC_MANIFEST on, collectstatic writes hashed names plus .gz/.br copies
+# of text assets (.br needs the optional brotli package).
+STATIC_MANIFEST = os.getenv('STATIC_MANIFEST', 'false').lower() == 'true'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('car_rental.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+                    else 'django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
+
+# Serve /static/ and /media/ from Django. On by default only with DEBUG; in
+# production set to true explicitly, or leave it off and let the web server map
+# them to STATIC_ROOT/MEDIA_ROOT.
+SERVE_FILES = os.getenv('SERVE_FILES', str(DEBUG)).lower() == 'true'
+# '' streams media from the worker. 'x-sendfile' (Apache/lighttpd) or
+# 'x-accel-redirect' (nginx) only sends headers and lets the web server send the
+# bytes; for nginx, MEDIA_OFFLOAD_PREFIX is an `internal` location aliased to MEDIA_ROOT.
+MEDIA_OFFLOAD = os.getenv('MEDIA_OFFLOAD', '')
+MEDIA_OFFLOAD_PREFIX = os.getenv('MEDIA_OFFLOAD_PREFIX', '/protected-media/')
+
+# Seconds before the in-process availability engine reloads loan periods from the DB.
+AVAILABILITY_ENGINE_TTL = 300
+
+# Resized JPEG/WebP copies built for each uploaded car image, by width in pixels.
+CAR_IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+# Build them on a background thread pool of CAR_IMAGE_WORKERS threads.
+CAR_IMAGE_VARIANTS_ASYNC = True
+CAR_IMAGE_WORKERS = 2
+# Identical uploads share one file. A file saved or re-uploaded in the last
+# CAR_IMAGE_GRACE_SECONDS is kept when its last image is deleted, since a
+# concurrent upload of the same bytes may not have committed its row yet;
+# gc_car_images removes it later if nothing references it.
+CAR_IMAGE_GRACE_SECONDS = 3600
+
+# Request instrumentation (car_rental.middleware.PerformanceMiddleware). Metrics
+# are per process; scrape every worker or aggregate them in Prometheus.
+PERF_RECORD_SQL = os.getenv('PERF_RECORD_SQL', 'true').lower() == 'true'
+# Executing the same SQL shape this many times in one request is logged as a likely N+1.
+PERF_N_PLUS_ONE_THRESHOLD = 10
+# Most recent requests per view kept for the percentiles.
+PERF_METRICS_WINDOW = 1000
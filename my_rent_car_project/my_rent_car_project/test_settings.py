@@ -0,0 +1,29 @@
+# Settings for running the test suite without MySQL:
+#
+#   python manage.py test car_rental --settings=my_rent_car_project.test_settings
+#
+# The primary and the replica are two separate SQLite databases (in-memory
+# while testing), so the read-replica routing tests run against a real second
+# connection instead of being skipped.
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+# Other manage.py commands run with these settings keep their files out of the source tree.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), 'car_rental_primary.sqlite3'),
+    },
+    DATABASE_REPLICA_ALIAS: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), 'car_rental_replica.sqlite3'),
+    },
+}
+
+# The static and media tests go through Django's own file views.
+SERVE_FILES = True
+
+# Cheap password hashes keep user setup fast; the hashing tests set their own costs.
+PASSWORD_PBKDF2_ITERATIONS = 1000